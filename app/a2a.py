@@ -2,55 +2,88 @@ import os
 import sqlite3
 import time
 import uuid
-from typing import Any, Dict
+from typing import Any, Dict, List
 
+import orjson
 from loguru import logger
 
+from .sqlite_pool import get_connection, transaction
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS a2a_messages (
+  message_id TEXT PRIMARY KEY,
+  conversation_id TEXT NOT NULL,
+  from_agent TEXT NOT NULL,
+  to_agent TEXT NOT NULL,
+  intent TEXT NOT NULL,
+  payload TEXT NOT NULL,
+  confidence REAL NOT NULL,
+  ts INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_a2a_conv_ts ON a2a_messages(conversation_id, ts DESC);
+"""
+
 
 def _db_path() -> str:
     return os.getenv("A2A_DB", "a2a.db")
 
 
-def _ensure_table():
-    conn = sqlite3.connect(_db_path())
-    try:
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS a2a_messages (
-              message_id TEXT PRIMARY KEY,
-              conversation_id TEXT NOT NULL,
-              from_agent TEXT NOT NULL,
-              to_agent TEXT NOT NULL,
-              intent TEXT NOT NULL,
-              payload TEXT NOT NULL,
-              confidence REAL NOT NULL,
-              ts INTEGER NOT NULL
-            )
-            """
-        )
-        conn.commit()
-    finally:
-        conn.close()
+def _get_conn() -> sqlite3.Connection:
+    return get_connection(_db_path(), _SCHEMA)
+
+
+def init_a2a_db() -> None:
+    """Open the shared connection (creating the table) ahead of the first message."""
+    _get_conn()
 
 
 def send_message(from_agent: str, to_agent: str, payload: Dict[str, Any], conversation_id: str, intent: str = "inform", confidence: float = 0.7) -> str:
-    _ensure_table()
-    mid = str(uuid.uuid4())
+    return send_messages_bulk([
+        {
+            "from_agent": from_agent,
+            "to_agent": to_agent,
+            "payload": payload,
+            "conversation_id": conversation_id,
+            "intent": intent,
+            "confidence": confidence,
+        }
+    ])[0]
+
+
+def send_messages_bulk(messages: List[Dict[str, Any]]) -> List[str]:
+    """
+    Persist several messages in one transaction (a single commit/fsync).
+
+    Each item takes the same keys as `send_message` arguments; `intent` and
+    `confidence` are optional. Returns the message ids in input order.
+    """
     ts = int(time.time())
-    conn = sqlite3.connect(_db_path())
-    try:
-        conn.execute(
+    rows = [
+        (
+            uuid.uuid4().hex,
+            m["conversation_id"],
+            m["from_agent"],
+            m["to_agent"],
+            m.get("intent", "inform"),
+            json_dumps(m["payload"]),
+            m.get("confidence", 0.7),
+            ts,
+        )
+        for m in messages
+    ]
+    if not rows:
+        return []
+    with transaction(_db_path(), _SCHEMA) as conn:
+        conn.executemany(
             "INSERT INTO a2a_messages (message_id, conversation_id, from_agent, to_agent, intent, payload, confidence, ts) VALUES (?,?,?,?,?,?,?,?)",
-            (mid, conversation_id, from_agent, to_agent, intent, json_dumps(payload), confidence, ts),
+            rows,
         )
-        conn.commit()
-        logger.info("a2a_message_sent", extra={"message_id": mid, "conversation_id": conversation_id})
-        return mid
-    finally:
-        conn.close()
+    for r in rows:
+        logger.info("a2a_message_sent", extra={"message_id": r[0], "conversation_id": r[1]})
+    return [r[0] for r in rows]
 
 
 def json_dumps(obj: Dict[str, Any]) -> str:
-    import json
-
-    return json.dumps(obj, separators=(",", ":"))
\ No newline at end of file
+    # orjson output is already compact; numpy arrays (embeddings) serialize as lists.
+    return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode()
@@ -1,5 +1,8 @@
-import os
 import io
+import os
+import wave
+from typing import Any, Dict, List, Optional
+
 from groq import Groq
 from dotenv import load_dotenv
 from loguru import logger
@@ -8,6 +11,14 @@ load_dotenv()
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
+# Streaming input format: PCM16, 16 kHz, mono.
+SAMPLE_RATE = 16000
+BYTES_PER_SECOND = SAMPLE_RATE * 2
+# Seconds of new audio to accumulate before re-transcribing the window.
+MIN_CHUNK_SIZE = 1.0
+# Once the window grows past this, drop audio up to the last confirmed word.
+BUFFER_TRIM_SEC = 15.0
+
 class AudioTranscriber:
     def __init__(self):
         if GROQ_API_KEY:
@@ -18,9 +29,10 @@ class AudioTranscriber:
             self.enabled = False
             logger.warning("GROQ_API_KEY missing. Audio transcription disabled.")
 
-    def transcribe(self, audio_file) -> str:
+    def transcribe(self, audio_file, filename: str = "input.wav") -> str:
         """
-        Transcribes audio file-like object using Groq Whisper.
+        Transcribes an audio file-like object using Groq Whisper.
+        The stream is handed to the upload as-is, so the audio is never copied into memory.
         Returns the text string.
         """
         if not self.enabled:
@@ -32,7 +44,7 @@ class AudioTranscriber:
             
             # Call Groq API (whisper-large-v3-turbo is faster)
             transcription = self.client.audio.transcriptions.create(
-                file=("input.wav", audio_file.read()), # Groq expects filename/bytes tuple
+                file=(filename, audio_file), # Groq expects a filename/stream tuple
                 model="whisper-large-v3-turbo",
                 response_format="text"
             )
@@ -41,5 +53,135 @@ class AudioTranscriber:
             logger.error(f"Transcription failed: {e}")
             return f"[Error: {str(e)}]"
 
+    def transcribe_words(self, audio_file, filename: str = "input.wav", prompt: str = "") -> List[Dict[str, Any]]:
+        """
+        Word-level transcription of a WAV stream.
+        Returns [{"word", "start", "end"}, ...] with times relative to the clip.
+        """
+        audio_file.seek(0)
+        resp = self.client.audio.transcriptions.create(
+            file=(filename, audio_file),
+            model="whisper-large-v3-turbo",
+            response_format="verbose_json",
+            timestamp_granularities=["word"],
+            prompt=prompt or None,
+        )
+        # `words` is not a declared field on the SDK model; it arrives as an extra.
+        words = getattr(resp, "words", None) or []
+        out = []
+        for w in words:
+            get = w.get if isinstance(w, dict) else lambda k, _w=w: getattr(_w, k, None)
+            text = (get("word") or "").strip()
+            if text:
+                out.append({"word": text, "start": float(get("start") or 0.0), "end": float(get("end") or 0.0)})
+        return out
+
+
+def _pcm16_to_wav(pcm: bytes) -> io.BytesIO:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SAMPLE_RATE)
+        w.writeframes(pcm)
+    buf.seek(0)
+    return buf
+
+
+class StreamingTranscriber:
+    """
+    Whisper-Streaming style incremental transcription (LocalAgreement-2).
+
+    Audio is appended to a rolling buffer; every MIN_CHUNK_SIZE seconds the
+    unconfirmed window is re-transcribed, and the words on which the last two
+    hypotheses agree are confirmed and emitted. Confirmed audio is trimmed
+    from the buffer so each request stays bounded regardless of clip length.
+    """
+
+    def __init__(self, base: Optional[AudioTranscriber] = None):
+        self.base = base or transcriber
+        self.audio_buffer = bytearray()
+        # Absolute time (seconds) of audio_buffer[0] within the stream.
+        self.buffer_time_offset = 0.0
+        # Absolute end time of the last confirmed word.
+        self.last_confirmed_ts = 0.0
+        self.committed: List[Dict[str, Any]] = []
+        self._prev_hypothesis: List[Dict[str, Any]] = []
+        self._pending_bytes = 0
+
+    def insert_audio(self, pcm: bytes) -> None:
+        self.audio_buffer.extend(pcm)
+        self._pending_bytes += len(pcm)
+
+    def ready(self) -> bool:
+        return self._pending_bytes >= MIN_CHUNK_SIZE * BYTES_PER_SECOND
+
+    def _hypothesis(self) -> List[Dict[str, Any]]:
+        # Keep sample alignment even if a client split a frame mid-sample.
+        pcm = bytes(self.audio_buffer[: len(self.audio_buffer) // 2 * 2])
+        prompt = " ".join(w["word"] for w in self.committed[-50:])
+        words = self.base.transcribe_words(_pcm16_to_wav(pcm), "stream.wav", prompt=prompt)
+        hyp = []
+        for w in words:
+            start = w["start"] + self.buffer_time_offset
+            end = w["end"] + self.buffer_time_offset
+            # Skip words that overlap what was already confirmed.
+            if end <= self.last_confirmed_ts + 0.05:
+                continue
+            hyp.append({"word": w["word"], "start": start, "end": end})
+        return hyp
+
+    @staticmethod
+    def _agreed_prefix(prev: List[Dict[str, Any]], cur: List[Dict[str, Any]]) -> int:
+        n = 0
+        for a, b in zip(prev, cur):
+            if a["word"].lower().strip(".,!?") != b["word"].lower().strip(".,!?"):
+                break
+            n += 1
+        return n
+
+    def _commit(self, words: List[Dict[str, Any]]) -> str:
+        if not words:
+            return ""
+        self.committed.extend(words)
+        self.last_confirmed_ts = words[-1]["end"]
+        return " ".join(w["word"] for w in words)
+
+    def _trim(self) -> None:
+        if len(self.audio_buffer) / BYTES_PER_SECOND <= BUFFER_TRIM_SEC:
+            return
+        cut_sec = self.last_confirmed_ts - self.buffer_time_offset
+        cut = int(cut_sec * SAMPLE_RATE) * 2
+        if cut <= 0:
+            return
+        del self.audio_buffer[:cut]
+        self.buffer_time_offset += cut / BYTES_PER_SECOND
+
+    def process(self) -> str:
+        """Re-transcribe the window; returns newly confirmed text (may be empty)."""
+        self._pending_bytes = 0
+        cur = self._hypothesis()
+        n = self._agreed_prefix(self._prev_hypothesis, cur)
+        confirmed = self._commit(cur[:n])
+        self._prev_hypothesis = cur[n:]
+        self._trim()
+        return confirmed
+
+    def finish(self) -> str:
+        """Flush at end of stream: commit whatever the final pass hears."""
+        if not self.audio_buffer:
+            return ""
+        self._pending_bytes = 0
+        cur = self._hypothesis()
+        text = self._commit(cur)
+        self._prev_hypothesis = []
+        self.audio_buffer.clear()
+        return text
+
+    @property
+    def text(self) -> str:
+        return " ".join(w["word"] for w in self.committed)
+
+
 # Singleton
 transcriber = AudioTranscriber()
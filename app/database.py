@@ -7,6 +7,7 @@ from loguru import logger
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import StaticPool
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 
 load_dotenv()
@@ -37,11 +38,29 @@ engine = create_engine(
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Async Engine (for high-perf API)
+if "sqlite" in ASYNC_DATABASE_URL:
+    # A single shared connection is the only way an in-memory DB survives
+    # across sessions; file-backed SQLite keeps the default pool.
+    _async_pool_args = {"poolclass": StaticPool} if ":memory:" in ASYNC_DATABASE_URL else {}
+    _async_connect_args = {"check_same_thread": False}
+else:
+    # Keep warm Postgres connections around and recycle them before the
+    # server (or a proxy) silently drops idle ones.
+    _async_pool_args = {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": True,
+    }
+    _async_connect_args = {}
+
 async_engine = create_async_engine(
     ASYNC_DATABASE_URL,
     echo=False,
     future=True,
-    connect_args={"check_same_thread": False} if "sqlite" in ASYNC_DATABASE_URL else {}
+    connect_args=_async_connect_args,
+    **_async_pool_args,
 )
 AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, class_=AsyncSession)
 
@@ -60,6 +79,14 @@ async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
     async with AsyncSessionLocal() as session:
         yield session
 
+def insert_ignore(model):
+    """INSERT ... ON CONFLICT DO NOTHING for `model`, in the async engine's dialect."""
+    if async_engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
 def init_db():
     """Initialize database tables."""
     try:
@@ -0,0 +1,91 @@
+"""
+Persistent embedding cache in front of `llm.create_embedding`.
+
+Lookups go through an in-process LRU (hot set) and then a SQLite table on
+the shared WAL connection, so repeated inputs skip the embedding API
+entirely, across requests and restarts. Entries are keyed by
+(model, blake2b-128(text)) and hold int8 vectors plus a scale (1 B/dim).
+
+Functions:
+- get_or_compute(text) -> List[float]
+- aget_or_compute(text) -> List[float]   (async, for request handlers)
+"""
+
+import hashlib
+import os
+from typing import List, Tuple
+
+import numpy as np
+from cachetools import LRUCache
+
+from . import llm
+from .sqlite_pool import get_async_connection, get_connection
+from .vectors import dequantize_int8, quantize_int8
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings_cache (
+  model TEXT NOT NULL,
+  key BLOB NOT NULL,
+  vec_q BLOB NOT NULL,
+  scale REAL NOT NULL,
+  PRIMARY KEY (model, key)
+);
+"""
+
+_SELECT = "SELECT vec_q, scale FROM embeddings_cache WHERE model=? AND key=?"
+_INSERT = "INSERT OR IGNORE INTO embeddings_cache (model, key, vec_q, scale) VALUES (?,?,?,?)"
+
+_MEM_LRU: LRUCache = LRUCache(maxsize=4096)
+
+
+def _db_path() -> str:
+    return os.getenv("EMBEDDING_CACHE_DB", "embeddings.db")
+
+
+def _key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def _quantize(vec: List[float]) -> Tuple[bytes, float]:
+    q, scale = quantize_int8(vec)
+    return q.tobytes(), scale
+
+
+def _dequantize(entry: Tuple[bytes, float]) -> List[float]:
+    blob, scale = entry
+    return dequantize_int8(np.frombuffer(blob, dtype=np.int8), scale).tolist()
+
+
+def get_or_compute(text: str) -> List[float]:
+    model = llm.OPENAI_EMBEDDING_MODEL
+    key = _key(text)
+    entry = _MEM_LRU.get((model, key))
+    if entry is None:
+        conn = get_connection(_db_path(), _SCHEMA)
+        row = conn.execute(_SELECT, (model, key)).fetchone()
+        if row is None:
+            entry = _quantize(llm.create_embedding(text))
+            conn.execute(_INSERT, (model, key, *entry))
+        else:
+            entry = (row[0], row[1])
+        _MEM_LRU[(model, key)] = entry
+    # Always return the dequantized vector so hits and misses are bit-identical.
+    return _dequantize(entry)
+
+
+async def aget_or_compute(text: str) -> List[float]:
+    model = llm.OPENAI_EMBEDDING_MODEL
+    key = _key(text)
+    entry = _MEM_LRU.get((model, key))
+    if entry is None:
+        conn = await get_async_connection(_db_path(), _SCHEMA)
+        async with conn.execute(_SELECT, (model, key)) as cur:
+            row = await cur.fetchone()
+        if row is None:
+            entry = _quantize(await llm.acreate_embedding(text))
+            await conn.execute(_INSERT, (model, key, *entry))
+        else:
+            entry = (row[0], row[1])
+        _MEM_LRU[(model, key)] = entry
+    return _dequantize(entry)
@@ -1,7 +1,26 @@
 import os
-import sqlite3
 import time
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
+
+from .sqlite_pool import async_transaction, get_async_connection, get_connection
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS evaluations (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  trace_id TEXT NOT NULL,
+  user_id TEXT NOT NULL,
+  rating INTEGER NOT NULL,
+  comments TEXT,
+  ts INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_eval_user_ts ON evaluations(user_id, ts DESC);
+CREATE TABLE IF NOT EXISTS consents (
+  user_id TEXT PRIMARY KEY,
+  consent INTEGER NOT NULL,
+  ts INTEGER NOT NULL
+);
+"""
 
 
 def _db_path() -> str:
@@ -9,74 +28,46 @@ def _db_path() -> str:
 
 
 def init_eval_db() -> None:
-    conn = sqlite3.connect(_db_path())
-    try:
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS evaluations (
-              id INTEGER PRIMARY KEY AUTOINCREMENT,
-              trace_id TEXT NOT NULL,
-              user_id TEXT NOT NULL,
-              rating INTEGER NOT NULL,
-              comments TEXT,
-              ts INTEGER NOT NULL
-            )
-            """
-        )
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS consents (
-              user_id TEXT PRIMARY KEY,
-              consent INTEGER NOT NULL,
-              ts INTEGER NOT NULL
-            )
-            """
-        )
-        conn.commit()
-    finally:
-        conn.close()
+    get_connection(_db_path(), _SCHEMA)
 
 
-def submit_evaluation(trace_id: str, user_id: str, rating: int, comments: Optional[str]) -> int:
-    conn = sqlite3.connect(_db_path())
-    try:
-        cur = conn.execute(
-            "INSERT INTO evaluations (trace_id, user_id, rating, comments, ts) VALUES (?,?,?,?,?)",
-            (trace_id, user_id, rating, comments or "", int(time.time())),
-        )
-        conn.commit()
-        return int(cur.lastrowid)
-    finally:
-        conn.close()
+async def submit_evaluation(trace_id: str, user_id: str, rating: int, comments: Optional[str]) -> int:
+    return (await submit_evaluations_bulk([(trace_id, user_id, rating, comments)]))[0]
+
 
+async def submit_evaluations_bulk(rows: List[Tuple[str, str, int, Optional[str]]]) -> List[int]:
+    """Insert (trace_id, user_id, rating, comments) rows in one transaction; returns row ids in order."""
+    ts = int(time.time())
+    ids: List[int] = []
+    async with async_transaction(_db_path(), _SCHEMA) as conn:
+        for trace_id, user_id, rating, comments in rows:
+            async with conn.execute(
+                "INSERT INTO evaluations (trace_id, user_id, rating, comments, ts) VALUES (?,?,?,?,?) RETURNING id",
+                (trace_id, user_id, rating, comments or "", ts),
+            ) as cur:
+                ids.append(int((await cur.fetchone())[0]))
+    return ids
 
-def set_consent(user_id: str, consent: bool) -> None:
-    conn = sqlite3.connect(_db_path())
-    try:
-        conn.execute(
+
+async def set_consent(user_id: str, consent: bool) -> None:
+    async with async_transaction(_db_path(), _SCHEMA) as conn:
+        await conn.execute(
             "REPLACE INTO consents (user_id, consent, ts) VALUES (?,?,?)",
             (user_id, 1 if consent else 0, int(time.time())),
         )
-        conn.commit()
-    finally:
-        conn.close()
 
 
-def daily_summary(user_id: str) -> Dict[str, Any]:
-    conn = sqlite3.connect(_db_path())
-    try:
-        start = int(time.time()) - 86400
-        cur = conn.execute(
-            "SELECT rating FROM evaluations WHERE user_id=? AND ts>=?",
-            (user_id, start),
-        )
-        rows = cur.fetchall()
-        ratings = [r[0] for r in rows]
-        avg = sum(ratings) / len(ratings) if ratings else 0.0
-        return {
-            "user_id": user_id,
-            "satisfaction_avg": avg,
-            "future_prediction_accuracy": None,
-        }
-    finally:
-        conn.close()
\ No newline at end of file
+async def daily_summary(user_id: str) -> Dict[str, Any]:
+    conn = await get_async_connection(_db_path(), _SCHEMA)
+    start = int(time.time()) - 86400
+    async with conn.execute(
+        "SELECT AVG(rating), COUNT(*) FROM evaluations WHERE user_id=? AND ts>=?",
+        (user_id, start),
+    ) as cur:
+        avg, count = await cur.fetchone()
+    return {
+        "user_id": user_id,
+        "satisfaction_avg": float(avg) if count else 0.0,
+        "ratings_count": count,
+        "future_prediction_accuracy": None,
+    }
@@ -1,155 +1,255 @@
+import asyncio
 import os
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
+import httpx
+import orjson
+import requests
 from dotenv import load_dotenv
 from loguru import logger
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 import google.generativeai as genai
 
 
+load_dotenv()
+
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
+
+GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-4-maverick")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+OPENAI_LLM_MODEL = os.getenv("OPENAI_LLM_MODEL", "gpt-4o-mini")
+OPENAI_EMBEDDING_MODEL = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
+
+if GROQ_API_KEY:
+    _PROVIDER: Optional[str] = "groq"
+elif GEMINI_API_KEY:
+    _PROVIDER = "gemini"
+elif OPENAI_API_KEY:
+    _PROVIDER = "openai"
+else:
+    _PROVIDER = None
+
 _client: Optional[OpenAI] = None
+_async_client: Optional[AsyncOpenAI] = None
 _gemini_configured = False
 
+# Keep-alive session so repeated Gemini calls reuse the TLS connection.
+_gemini_session = requests.Session()
+# Async counterpart for request handlers: HTTP/2 multiplexes concurrent agent
+# calls over one pooled connection instead of a handshake per call.
+# Created on first use so a restart after aclose() gets a fresh client.
+_http: Optional[httpx.AsyncClient] = None
+
 
 def _get_llm_provider() -> str:
-    """Determine which LLM provider to use based on environment variables."""
-    load_dotenv()
-    if os.getenv("GROQ_API_KEY"):
-        return "groq"
-    elif os.getenv("GEMINI_API_KEY"):
-        return "gemini"
-    elif os.getenv("OPENAI_API_KEY"):
-        return "openai"
-    else:
+    """Return the LLM provider chosen from the environment at import time."""
+    if _PROVIDER is None:
         raise RuntimeError("No API key found. Set GROQ_API_KEY, GEMINI_API_KEY or OPENAI_API_KEY")
+    return _PROVIDER
+
+
+def _client_kwargs() -> Dict[str, Any]:
+    if GROQ_API_KEY:
+        return {"api_key": GROQ_API_KEY, "base_url": "https://api.groq.com/openai/v1"}
+    if not OPENAI_API_KEY:
+        logger.error("OPENAI_API_KEY is not set")
+        raise RuntimeError("OPENAI_API_KEY is required")
+    if OPENAI_BASE_URL:
+        return {"api_key": OPENAI_API_KEY, "base_url": OPENAI_BASE_URL}
+    return {"api_key": OPENAI_API_KEY}
 
 
 def _get_client() -> OpenAI:
     global _client
     if _client is None:
-        load_dotenv()
-        if os.getenv("GROQ_API_KEY"):
-            api_key = os.getenv("GROQ_API_KEY")
-            base_url = "https://api.groq.com/openai/v1"
-            _client = OpenAI(api_key=api_key, base_url=base_url)
-        else:
-            api_key = os.getenv("OPENAI_API_KEY")
-            if not api_key:
-                logger.error("OPENAI_API_KEY is not set")
-                raise RuntimeError("OPENAI_API_KEY is required")
-            
-            base_url = os.getenv("OPENAI_BASE_URL")
-            if base_url:
-                _client = OpenAI(api_key=api_key, base_url=base_url)
-            else:
-                _client = OpenAI(api_key=api_key)
+        _client = OpenAI(**_client_kwargs())
     return _client
 
 
+def _get_async_client() -> AsyncOpenAI:
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncOpenAI(**_client_kwargs())
+    return _async_client
+
+
+def _get_http() -> httpx.AsyncClient:
+    global _http
+    if _http is None:
+        _http = httpx.AsyncClient(
+            http2=True,
+            timeout=60.0,
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=50),
+        )
+    return _http
+
+
 def _configure_gemini():
     """Configure Google Gemini API."""
     global _gemini_configured
     if not _gemini_configured:
-        load_dotenv()
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
+        if not GEMINI_API_KEY:
             logger.error("GEMINI_API_KEY is not set")
             raise RuntimeError("GEMINI_API_KEY is required")
-        genai.configure(api_key=api_key)
+        genai.configure(api_key=GEMINI_API_KEY)
         _gemini_configured = True
 
 
 def call_llm(prompt: str, system: Optional[str] = None, temperature: float = 0.7, max_tokens: int = 4000, model_override: Optional[str] = None) -> str:
-    provider = _get_llm_provider()
-    
-    if provider == "groq":
-        return _call_groq(prompt, system, temperature, max_tokens, model_override)
-    elif provider == "gemini":
-        return _call_gemini(prompt, system, temperature, max_tokens, model_override)
-    else:
-        return _call_openai(prompt, system, temperature, max_tokens, model_override)
+    return _CALLS[_get_llm_provider()](prompt, system, temperature, max_tokens, model_override)
+
+
+async def acall_llm(prompt: str, system: Optional[str] = None, temperature: float = 0.7, max_tokens: int = 4000, model_override: Optional[str] = None) -> str:
+    """Non-blocking `call_llm` for async handlers."""
+    return await _ACALLS[_get_llm_provider()](prompt, system, temperature, max_tokens, model_override)
+
+
+async def acall_llm_batch(prompts: List[str], system: Optional[str] = None, temperature: float = 0.7, max_tokens: int = 4000, model_override: Optional[str] = None, systems: Optional[List[Optional[str]]] = None) -> List[Any]:
+    """
+    Issue several independent prompts concurrently over the shared clients.
+    `systems`, if given, holds one system message per prompt (overriding `system`).
+    Returns one entry per prompt, in order: the text, or the exception raised.
+    """
+    if systems is None:
+        systems = [system] * len(prompts)
+    return await asyncio.gather(
+        *(acall_llm(p, s, temperature, max_tokens, model_override) for p, s in zip(prompts, systems)),
+        return_exceptions=True,
+    )
+
+
+async def aclose() -> None:
+    """Release pooled HTTP connections (call on app shutdown)."""
+    global _http, _async_client
+    if _http is not None:
+        await _http.aclose()
+        _http = None
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+
+
+_GEMINI_HEADERS = {"Content-Type": "application/json"}
+# generateContent URL per model name; the default model's is built once here.
+_GEMINI_URLS: Dict[str, str] = {}
+
+
+def _gemini_url(model_name: str) -> str:
+    url = _GEMINI_URLS.get(model_name)
+    if url is None:
+        url = f"https://generativelanguage.googleapis.com/v1beta/models/{model_name}:generateContent?key={GEMINI_API_KEY}"
+        _GEMINI_URLS[model_name] = url
+    return url
+
+
+if GEMINI_API_KEY:
+    _gemini_url(GEMINI_MODEL)
+
+
+def _gemini_request(prompt: str, system: Optional[str], temperature: float, max_tokens: int, model_override: Optional[str]) -> Tuple[str, bytes]:
+    if not GEMINI_API_KEY:
+        raise RuntimeError("GEMINI_API_KEY is required")
+
+    model_name = model_override or GEMINI_MODEL
+    logger.info(f"Calling Gemini model: {model_name} via REST")
+
+    data: Dict[str, Any] = {
+        "contents": [{
+            "parts": [{"text": prompt}]
+        }],
+        "generationConfig": {
+            "temperature": temperature,
+            "maxOutputTokens": max_tokens
+        }
+    }
+    if system:
+        # Sent separately so the fixed instructions form a cacheable prefix.
+        data["systemInstruction"] = {"parts": [{"text": system}]}
+    return _gemini_url(model_name), orjson.dumps(data)
+
+
+def _gemini_text(status_code: int, body: str, res_json: Any) -> str:
+    if status_code != 200:
+        logger.error(f"Gemini API failed: {status_code} - {body}")
+        raise RuntimeError(f"Gemini API failed: {status_code} - {body}")
+
+    if "candidates" in res_json and res_json["candidates"]:
+        candidate = res_json["candidates"][0]
+        if "content" in candidate and "parts" in candidate["content"]:
+            text = candidate["content"]["parts"][0]["text"]
+            logger.info(f"Gemini call succeeded, response length: {len(text)}")
+            return text
+
+    logger.error(f"Unexpected Gemini response format: {res_json}")
+    raise RuntimeError(f"Unexpected Gemini response format: {res_json}")
 
 
 def _call_gemini(prompt: str, system: Optional[str] = None, temperature: float = 0.7, max_tokens: int = 4000, model_override: Optional[str] = None) -> str:
     try:
-        import requests
-        load_dotenv()
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise RuntimeError("GEMINI_API_KEY is required")
-            
-        model_name = model_override or os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
-        logger.info(f"Calling Gemini model: {model_name} via REST")
-        
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/{model_name}:generateContent?key={api_key}"
-        
-        # Combine system and user prompt
-        full_prompt = prompt
-        if system:
-            full_prompt = f"{system}\n\n{prompt}"
-        
-        headers = {"Content-Type": "application/json"}
-        data = {
-            "contents": [{
-                "parts": [{"text": full_prompt}]
-            }],
-            "generationConfig": {
-                "temperature": temperature,
-                "maxOutputTokens": max_tokens
-            }
-        }
-        
+        url, body = _gemini_request(prompt, system, temperature, max_tokens, model_override)
+        logger.info("Sending request to Gemini API...")
+        response = _gemini_session.post(url, headers=_GEMINI_HEADERS, data=body, timeout=60)
+        res_json = orjson.loads(response.content) if response.status_code == 200 else None
+        return _gemini_text(response.status_code, response.text, res_json)
+
+    except Exception as e:
+        logger.exception(f"Gemini call failed: {str(e)}")
+        raise RuntimeError(f"Gemini error: {e}")
+
+
+async def _acall_gemini(prompt: str, system: Optional[str] = None, temperature: float = 0.7, max_tokens: int = 4000, model_override: Optional[str] = None) -> str:
+    try:
+        url, body = _gemini_request(prompt, system, temperature, max_tokens, model_override)
         logger.info("Sending request to Gemini API...")
-        response = requests.post(url, headers=headers, json=data, timeout=60)
-        
-        if response.status_code != 200:
-            logger.error(f"Gemini API failed: {response.status_code} - {response.text}")
-            raise RuntimeError(f"Gemini API failed: {response.status_code} - {response.text}")
-            
-        res_json = response.json()
-        
-        if "candidates" in res_json and res_json["candidates"]:
-            candidate = res_json["candidates"][0]
-            if "content" in candidate and "parts" in candidate["content"]:
-                text = candidate["content"]["parts"][0]["text"]
-                logger.info(f"Gemini call succeeded, response length: {len(text)}")
-                return text
-                
-        logger.error(f"Unexpected Gemini response format: {res_json}")
-        raise RuntimeError(f"Unexpected Gemini response format: {res_json}")
+        response = await _get_http().post(url, headers=_GEMINI_HEADERS, content=body)
+        res_json = orjson.loads(response.content) if response.status_code == 200 else None
+        return _gemini_text(response.status_code, response.text, res_json)
 
     except Exception as e:
         logger.exception(f"Gemini call failed: {str(e)}")
         raise RuntimeError(f"Gemini error: {e}")
 
 
+def _messages(prompt: str, system: Optional[str]) -> List[Dict[str, str]]:
+    messages = []
+    if system:
+        messages.append({"role": "system", "content": system})
+    messages.append({"role": "user", "content": prompt})
+    return messages
+
+
+def _groq_kwargs(model: str, prompt: str, system: Optional[str], temperature: float, max_tokens: int) -> Dict[str, Any]:
+    kwargs: Dict[str, Any] = {"model": model, "messages": _messages(prompt, system)}
+    # If using the specialized openai OSS reasoning model on Groq
+    if "gpt-oss-120b" in model:
+        kwargs.update(temperature=1, max_completion_tokens=max_tokens, top_p=1, reasoning_effort="medium")
+    else:
+        kwargs.update(temperature=temperature, max_tokens=max_tokens)
+    return kwargs
+
+
 def _call_groq(prompt: str, system: Optional[str] = None, temperature: float = 0.7, max_tokens: int = 4000, model_override: Optional[str] = None) -> str:
     try:
         client = _get_client()
-        model = model_override or os.getenv("GROQ_MODEL", "llama-4-maverick")
-        messages = []
-        if system:
-            messages.append({"role": "system", "content": system})
-        messages.append({"role": "user", "content": prompt})
-        
-        # If using the specialized openai OSS reasoning model on Groq
-        if "gpt-oss-120b" in model:
-            resp = client.chat.completions.create(
-                model=model,
-                messages=messages,
-                temperature=1,
-                max_completion_tokens=max_tokens,
-                top_p=1,
-                reasoning_effort="medium"
-            )
-        else:
-            resp = client.chat.completions.create(
-                model=model,
-                messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens,
-            )
-        
+        model = model_override or GROQ_MODEL
+        resp = client.chat.completions.create(**_groq_kwargs(model, prompt, system, temperature, max_tokens))
+        content = resp.choices[0].message.content or ""
+        text = content.strip()
+        logger.info("Groq call succeeded", extra={"model": model, "tokens": resp.usage})
+        return text
+    except Exception as e:
+        logger.exception("Groq call failed")
+        raise RuntimeError(f"Groq error: {e}")
+
+
+async def _acall_groq(prompt: str, system: Optional[str] = None, temperature: float = 0.7, max_tokens: int = 4000, model_override: Optional[str] = None) -> str:
+    try:
+        client = _get_async_client()
+        model = model_override or GROQ_MODEL
+        resp = await client.chat.completions.create(**_groq_kwargs(model, prompt, system, temperature, max_tokens))
         content = resp.choices[0].message.content or ""
         text = content.strip()
         logger.info("Groq call succeeded", extra={"model": model, "tokens": resp.usage})
@@ -162,14 +262,29 @@ def _call_groq(prompt: str, system: Optional[str] = None, temperature: float = 0
 def _call_openai(prompt: str, system: Optional[str] = None, temperature: float = 0.7, max_tokens: int = 4000, model_override: Optional[str] = None) -> str:
     try:
         client = _get_client()
-        model = model_override or os.getenv("OPENAI_LLM_MODEL", "gpt-4o-mini")
-        messages = []
-        if system:
-            messages.append({"role": "system", "content": system})
-        messages.append({"role": "user", "content": prompt})
+        model = model_override or OPENAI_LLM_MODEL
         resp = client.chat.completions.create(
             model=model,
-            messages=messages,
+            messages=_messages(prompt, system),
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+        content = resp.choices[0].message.content or ""
+        text = content.strip()
+        logger.info("LLM call succeeded", extra={"model": model, "tokens": resp.usage})
+        return text
+    except Exception as e:
+        logger.exception("LLM call failed")
+        raise RuntimeError(f"LLM error: {e}")
+
+
+async def _acall_openai(prompt: str, system: Optional[str] = None, temperature: float = 0.7, max_tokens: int = 4000, model_override: Optional[str] = None) -> str:
+    try:
+        client = _get_async_client()
+        model = model_override or OPENAI_LLM_MODEL
+        resp = await client.chat.completions.create(
+            model=model,
+            messages=_messages(prompt, system),
             temperature=temperature,
             max_tokens=max_tokens,
         )
@@ -182,14 +297,32 @@ def _call_openai(prompt: str, system: Optional[str] = None, temperature: float =
         raise RuntimeError(f"LLM error: {e}")
 
 
+# Provider -> implementation, used by call_llm / acall_llm.
+_CALLS = {"groq": _call_groq, "gemini": _call_gemini, "openai": _call_openai}
+_ACALLS = {"groq": _acall_groq, "gemini": _acall_gemini, "openai": _acall_openai}
+
+
 def create_embedding(text: str) -> List[float]:
     try:
         client = _get_client()
-        model = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
+        model = OPENAI_EMBEDDING_MODEL
         resp = client.embeddings.create(model=model, input=text)
         vec = resp.data[0].embedding
         logger.info("Embedding created", extra={"model": model, "length": len(vec)})
         return list(vec)
     except Exception as e:
         logger.exception("Embedding creation failed")
-        raise RuntimeError(f"Embedding error: {e}")
\ No newline at end of file
+        raise RuntimeError(f"Embedding error: {e}")
+
+
+async def acreate_embedding(text: str) -> List[float]:
+    try:
+        client = _get_async_client()
+        model = OPENAI_EMBEDDING_MODEL
+        resp = await client.embeddings.create(model=model, input=text)
+        vec = resp.data[0].embedding
+        logger.info("Embedding created", extra={"model": model, "length": len(vec)})
+        return list(vec)
+    except Exception as e:
+        logger.exception("Embedding creation failed")
+        raise RuntimeError(f"Embedding error: {e}")
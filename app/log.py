@@ -0,0 +1,99 @@
+"""
+Lightweight structured event log for hot paths (tool calls).
+
+loguru's `logger.bind(...)` builds a new logger per call and serializes on
+the calling thread. Here the request fields live in a context variable,
+`log()` only enqueues a tuple, and a daemon thread turns records into
+JSON lines on stdout.
+
+Usage:
+    token = ctx.set({"request_id": rid, "tool": name})
+    try:
+        log("tool_call_start")
+    finally:
+        ctx.reset(token)
+
+Set LOG_LEVEL (DEBUG/INFO/WARNING/ERROR, default INFO) to filter events
+before they are queued.
+"""
+
+import atexit
+import contextvars
+import os
+import queue
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Dict, Optional, Tuple
+
+import orjson
+
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+_enabled_level = LEVELS.get(os.getenv("LOG_LEVEL", "INFO").upper(), LEVELS["INFO"])
+
+# Never mutated: callers set a fresh dict per request.
+ctx: contextvars.ContextVar[Dict[str, Any]] = contextvars.ContextVar("req", default={})
+
+# A None record tells the writer thread to stop.
+_q: "queue.Queue[Optional[Tuple[float, str, str, Dict[str, Any]]]]" = queue.Queue()
+
+
+def log(event: str, level: str = "INFO", **kv: Any) -> None:
+    if LEVELS[level] < _enabled_level:
+        return
+    _q.put_nowait((time.time(), level, event, {**ctx.get(), **kv} if kv else ctx.get()))
+
+
+def _write(record: Tuple[float, str, str, Dict[str, Any]]) -> None:
+    ts, level, event, fields = record
+    line = orjson.dumps({"ts": ts, "level": level, "event": event, **fields}, default=str)
+    sys.stdout.write(line.decode() + "\n")
+
+
+def _report_failure() -> None:
+    # Don't let a bad record kill the writer, but don't lose it silently either.
+    sys.stderr.write("event log: failed to write record\n" + traceback.format_exc())
+
+
+def _writer_loop() -> None:
+    while True:
+        record = _q.get()
+        if record is None:
+            break
+        try:
+            _write(record)
+            if _q.empty():
+                sys.stdout.flush()
+        except Exception:
+            _report_failure()
+
+
+def flush() -> None:
+    """
+    Stop the writer and write out anything still queued (called at exit).
+
+    The writer finishes the record it is on before seeing the sentinel, so
+    nothing it already dequeued is lost and lines never interleave.
+    """
+    _q.put_nowait(None)
+    _writer.join(timeout=5)
+    # Records logged by other threads after the sentinel.
+    while True:
+        try:
+            record = _q.get_nowait()
+        except queue.Empty:
+            break
+        if record is None:
+            continue
+        try:
+            _write(record)
+        except Exception:
+            _report_failure()
+    sys.stdout.flush()
+
+
+_writer = threading.Thread(target=_writer_loop, name="event-log-writer", daemon=True)
+_writer.start()
+atexit.register(flush)
@@ -2,28 +2,34 @@
 FastAPI app with v2.0 Production Endpoints.
 """
 
-import json
 import os
+import secrets
 import uuid
-import threading
 import asyncio
-import io
 from typing import Any, Dict, Optional, List
 
+import orjson
 from dotenv import load_dotenv
-from fastapi import BackgroundTasks, FastAPI, HTTPException, Request, Depends
+from fastapi import FastAPI, HTTPException, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, Response
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from loguru import logger
+from cachetools import LRUCache
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session as DBSession
 
-from .database import engine, SessionLocal, init_db, get_db
+from .database import engine, SessionLocal, init_db, get_db, get_async_db, insert_ignore
 from .models import User, Session
-from .orchestrator import orchestrate
+from .orchestrator import drain_background, orchestrate
 from .observability import REQUESTS_TOTAL
-from .eval import init_eval_db  # Keeping legacy eval for now, but will migrate to Postgres
+from .result_store import create_result_store
+from .llm import aclose as close_llm_clients
+from .eval import init_eval_db, submit_evaluation  # Keeping legacy eval for now, but will migrate to Postgres
+from .a2a import init_a2a_db
+from .sqlite_pool import close_all as close_sqlite_connections, close_all_async as close_async_sqlite_connections
 
 load_dotenv()
 
@@ -36,18 +42,58 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Finished results (with the 6-month roadmap) run to tens of KB of JSON.
+# SSE responses are excluded by Starlette, so streams still flush per event.
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 
 
-# In-memory result store for async polling (Production: use Redis)
-result_store: Dict[str, Dict[str, Any]] = {}
+# Result store for async polling (Redis when REDIS_URL is set, bounded TTL cache otherwise)
+result_store = create_result_store()
+
+# User ids already persisted by this process; lets /ingest skip the user upsert.
+_known_users: LRUCache = LRUCache(maxsize=10000)
+
+# Orchestrations running on the event loop. The loop only keeps weak
+# references to tasks, so hold them here until they finish.
+_inflight: "set[asyncio.Task]" = set()
+
+# Set when the trace's orchestration finishes, so /result/{id}/stream can
+# wake immediately instead of polling the store.
+_done_events: Dict[str, asyncio.Event] = {}
+# Set (and replaced) whenever a trace's stored state changes: progress or
+# completion. Stream readers take the event before reading the store, so an
+# update landing in between is never missed.
+_update_events: Dict[str, asyncio.Event] = {}
+RESULT_STREAM_TIMEOUT_SEC = float(os.getenv("RESULT_STREAM_TIMEOUT_SEC", "60"))
+INGEST_MAX_WAIT_MS = int(os.getenv("INGEST_MAX_WAIT_MS", "10000"))
+# Comment frames sent while a stream waits, so idle proxies keep it open.
+SSE_KEEPALIVE_SEC = float(os.getenv("SSE_KEEPALIVE_SEC", "20"))
 
 
 @app.on_event("startup")
-def on_startup():
-    init_db()  # Create tables in Postgres if they don't exist
+async def on_startup():
+    # Independent DDL (Postgres tables, eval/a2a SQLite files): run side by side.
+    await asyncio.gather(
+        asyncio.to_thread(init_db),
+        asyncio.to_thread(init_eval_db),
+        asyncio.to_thread(init_a2a_db),
+    )
     logger.info("Application startup: DB initialized.")
 
 
+@app.on_event("shutdown")
+async def on_shutdown():
+    for task in list(_inflight):
+        task.cancel()
+    await asyncio.gather(*_inflight, return_exceptions=True)
+    # Let queued memory/cache writes land before the stores go away.
+    await drain_background()
+    close_sqlite_connections()
+    await close_async_sqlite_connections()
+    await result_store.close()
+    await close_llm_clients()
+
+
 @app.exception_handler(Exception)
 async def generic_exception_handler(request: Request, exc: Exception):
     REQUESTS_TOTAL.labels(route=str(request.url.path), method=request.method, status="500").inc()
@@ -66,6 +112,8 @@ class IngestRequest(BaseModel):
     user_id: str
     text: str
     session_id: Optional[str] = None
+    # Hold the response up to this long for the result (capped at INGEST_MAX_WAIT_MS).
+    wait_ms: int = 0
 
 class QuestionRequest(BaseModel):
     text: str
@@ -87,6 +135,12 @@ class WeeklyFocusRequest(BaseModel):
     current_phase: str
     current_week: str
 
+class EvalRequest(BaseModel):
+    trace_id: str
+    user_id: str
+    rating: int
+    comments: Optional[str] = None
+
 class WeekChatRequest(BaseModel):
     user_id: str
     session_id: str
@@ -101,7 +155,7 @@ async def generate_questions(payload: QuestionRequest):
     """
     Generates 1 specific adaptive follow-up question based on the initial input and history.
     """
-    from .llm import call_llm
+    from .llm import acall_llm
     from .prompts import build_prompt
     from .orchestrator import _parse_json
     
@@ -111,7 +165,7 @@ async def generate_questions(payload: QuestionRequest):
             inputs["history"] = payload.history
             
         prompt_text = build_prompt("QuestionGeneratorAgent", inputs, None)
-        json_str = await asyncio.to_thread(call_llm, prompt_text, max_tokens=1000, model_override="llama-3.3-70b-versatile")
+        json_str = await acall_llm(prompt_text, max_tokens=1000, model_override="llama-3.3-70b-versatile")
         data = _parse_json(json_str)
         
         # Fallback to empty string if LLM fails
@@ -129,7 +183,7 @@ async def detect_contradiction(payload: ContradictionRequest):
     """
     Analyzes the user's answers for psychological contradictions before generating the blueprint.
     """
-    from .llm import call_llm
+    from .llm import acall_llm
     from .prompts import build_prompt
     from .orchestrator import _parse_json
     
@@ -139,7 +193,7 @@ async def detect_contradiction(payload: ContradictionRequest):
             "history": payload.history
         }
         prompt_text = build_prompt("ContradictionDetectorAgent", inputs, None)
-        json_str = await asyncio.to_thread(call_llm, prompt_text, max_tokens=1000, model_override="llama-3.3-70b-versatile")
+        json_str = await acall_llm(prompt_text, max_tokens=1000, model_override="llama-3.3-70b-versatile")
         data = _parse_json(json_str)
         
         return {
@@ -155,17 +209,18 @@ async def submit_checkin(payload: CheckinRequest, db: DBSession = Depends(get_db
     """
     Dynamically recalibrates the plan based on checkin status.
     """
-    from .llm import call_llm
+    from .llm import acall_llm
     from .prompts import build_prompt
     from .orchestrator import _parse_json
     
     try:
+        current_plan = orjson.dumps(payload.current_plan).decode()
         context = {
             "status": payload.status,
-            "current_plan": json.dumps(payload.current_plan)
+            "current_plan": current_plan
         }
-        prompt_text = build_prompt("RecalibrationAgent", {"focus": f"User status: {payload.status}\nCurrent plan: {json.dumps(payload.current_plan)}"}, context)
-        json_str = await asyncio.to_thread(call_llm, prompt_text)
+        prompt_text = build_prompt("RecalibrationAgent", {"focus": f"User status: {payload.status}\nCurrent plan: {current_plan}"}, context)
+        json_str = await acall_llm(prompt_text)
         recalibrated_data = _parse_json(json_str)
         
         return recalibrated_data
@@ -178,7 +233,7 @@ async def get_weekly_focus(payload: WeeklyFocusRequest):
     """
     Generates 3 behavioral focus areas for the current week in the 6-month plan.
     """
-    from .llm import call_llm
+    from .llm import acall_llm
     from .prompts import build_prompt
     from .orchestrator import _parse_json
     
@@ -187,7 +242,7 @@ async def get_weekly_focus(payload: WeeklyFocusRequest):
             "focus": f"Phase: {payload.current_phase}, Week: {payload.current_week}"
         }
         prompt_text = build_prompt("WeeklyFocusAgent", inputs, None)
-        json_str = await asyncio.to_thread(call_llm, prompt_text)
+        json_str = await acall_llm(prompt_text)
         data = _parse_json(json_str)
         return data
     except Exception as e:
@@ -197,20 +252,20 @@ async def get_weekly_focus(payload: WeeklyFocusRequest):
 @app.post("/chat_week", tags=["planner"])
 async def generate_week_chat(req: WeekChatRequest):
     """Handle chat interaction for a specific week."""
-    from .llm import call_llm
+    from .llm import acall_llm
     from .prompts import build_prompt
     from .orchestrator import _parse_json
     
     logger.info(f"Generating week chat for user {req.user_id}")
     try:
         context = {
-            "Week Context": json.dumps(req.week_context),
+            "Week Context": orjson.dumps(req.week_context).decode(),
             "Conversation History": "\n".join([f"{msg['role']}: {msg['content']}" for msg in req.chat_history[-5:]])
         }
         inputs = {"focus": req.message}
         prompt_text = build_prompt("WeekChatAgent", inputs, context)
         
-        json_str = await asyncio.to_thread(call_llm, prompt_text)
+        json_str = await acall_llm(prompt_text)
         parsed_response = _parse_json(json_str)
         
         # Save interaction to vector store (Disabled temporarily due to missing dependency)
@@ -225,102 +280,223 @@ async def generate_week_chat(req: WeekChatRequest):
         logger.exception("Week chat generation failed")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _update_session(sid: str, **fields: Any) -> None:
+    with SessionLocal() as db_inner:
+        s = db_inner.get(Session, sid)
+        if s:
+            for key, value in fields.items():
+                setattr(s, key, value)
+            db_inner.commit()
+
+
+def _notify_update(tid: str) -> None:
+    event = _update_events.pop(tid, None)
+    if event is not None:
+        event.set()
+
+
+async def _run_orchestration(tid: str, uid: str, raw_text: str, sid: str) -> None:
+    async def publish(stage: str, partial: Dict[str, Any]) -> None:
+        try:
+            await result_store.set(tid, {"status": "processing", "stage": stage, "partial": partial})
+            _notify_update(tid)
+        except Exception as e:
+            logger.warning(f"Progress update failed for {tid}: {e}")
+
+    try:
+        # 1. First, parse the raw unstructured text into Focus, History, Vision using StructureAgent
+        from .llm import acall_llm
+        from .prompts import build_prompt
+        from .orchestrator import _parse_json
+
+        logger.info("Structuring raw input with Groq StructureAgent...")
+        prompt_text = build_prompt("StructureAgent", {"focus": raw_text}, None)
+
+        structured_json_str = await acall_llm(prompt_text, max_tokens=2000, model_override="llama-3.3-70b-versatile")
+        structured_data = _parse_json(structured_json_str)
+
+        focus = structured_data.get("focus", raw_text)
+        history = structured_data.get("history", "")
+        vision = structured_data.get("vision", "")
+
+        # Update the session with the structured data
+        await asyncio.to_thread(_update_session, sid, focus=focus, history=history, vision=vision)
+
+        # 2. Call the orchestrator with the newly structured inputs
+        res = await orchestrate(uid, focus, history, vision, sid, on_progress=publish)
+
+        # Update DB with result
+        await asyncio.to_thread(_update_session, sid, result_json=orjson.dumps(res).decode())
+
+        await result_store.set(tid, res)
+    except Exception as e:
+        logger.exception(f"Orchestration failed for {tid}")
+        await result_store.set(tid, {"status": "error", "error": str(e)})
+    finally:
+        event = _done_events.pop(tid, None)
+        if event is not None:
+            event.set()
+        _notify_update(tid)
+
+
 @app.post("/ingest", tags=["ingest"])
-async def ingest(payload: IngestRequest, background_tasks: BackgroundTasks, db: DBSession = Depends(get_db)):
+async def ingest(payload: IngestRequest, db: AsyncSession = Depends(get_async_db)):
     """
     Main entry point for v2.0.
-    Starts the orchestration in background.
+    Starts the orchestration in background. With `wait_ms`, waits that long
+    for it and returns the finished result instead of just the trace id.
     """
     user_id = payload.user_id
-    
-    # Create/Get User
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        user = User(id=user_id)
-        db.add(user)
-        db.commit()
-
-    # Create Session Record
-    session_id = payload.session_id or str(uuid.uuid4())
-    session_rec = db.query(Session).filter(Session.id == session_id).first()
-    if not session_rec:
-        session_rec = Session(
+    session_id = payload.session_id or uuid.uuid4().hex
+
+    # Create the User/Session rows if missing: one transaction, no SELECTs.
+    # Users seen recently by this process skip their upsert entirely.
+    if user_id not in _known_users:
+        await db.execute(insert_ignore(User).values(id=user_id).on_conflict_do_nothing(index_elements=["id"]))
+    await db.execute(
+        insert_ignore(Session)
+        .values(
             id=session_id,
             user_id=user_id,
             focus=payload.text, # Since focus is required on the model, we store the full text there initially
             history="",
             vision=""
         )
-        db.add(session_rec)
-        db.commit()
-
-    trace_id = str(uuid.uuid4())
-    result_store[trace_id] = {"status": "processing"}
-
-    # Run orchestration in background thread (since it calls blocking sync LLM code wrapped in async)
-    def run_orchestrate(tid: str, uid: str, raw_text: str, sid: str):
+        .on_conflict_do_nothing(index_elements=["id"])
+    )
+    await db.commit()
+    _known_users[user_id] = True
+
+    trace_id = secrets.token_hex(16)
+    await result_store.set(trace_id, {"status": "processing"})
+    done = _done_events[trace_id] = asyncio.Event()
+
+    # Orchestration runs as a task on the server's event loop; only the
+    # blocking DB writes inside it are pushed to worker threads.
+    task = asyncio.create_task(_run_orchestration(trace_id, user_id, payload.text, session_id))
+    _inflight.add(task)
+    task.add_done_callback(_inflight.discard)
+
+    wait_ms = min(payload.wait_ms, INGEST_MAX_WAIT_MS)
+    if wait_ms > 0:
+        # Fast runs come back in this response, saving the client a round trip.
         try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                # 1. First, parse the raw unstructured text into Focus, History, Vision using StructureAgent
-                from .llm import call_llm
-                from .prompts import build_prompt
-                from .orchestrator import _parse_json
-                
-                logger.info("Structuring raw input with Groq StructureAgent...")
-                prompt_text = build_prompt("StructureAgent", {"focus": raw_text}, None)
-                
-                structured_json_str = call_llm(prompt_text, max_tokens=2000, model_override="llama-3.3-70b-versatile")
-                structured_data = _parse_json(structured_json_str)
-                
-                focus = structured_data.get("focus", raw_text)
-                history = structured_data.get("history", "")
-                vision = structured_data.get("vision", "")
-
-                # Update the session with the structured data
-                with SessionLocal() as db_inner:
-                    s = db_inner.query(Session).filter(Session.id == sid).first()
-                    if s:
-                        s.focus = focus
-                        s.history = history
-                        s.vision = vision
-                        db_inner.commit()
-
-                # 2. Call the orchestrator with the newly structured inputs
-                res = loop.run_until_complete(orchestrate(uid, focus, history, vision, sid))
-                
-                # Update DB with result (sync)
-                with SessionLocal() as db_inner:
-                    s = db_inner.query(Session).filter(Session.id == sid).first()
-                    if s:
-                        s.result_json = json.dumps(res)
-                        db_inner.commit()
-                
-                result_store[tid] = res
-            finally:
-                loop.close()
-        except Exception as e:
-            logger.exception(f"Orchestration failed for {tid}")
-            result_store[tid] = {"status": "error", "error": str(e)}
-
-    threading.Thread(
-        target=run_orchestrate, 
-        args=(trace_id, user_id, payload.text, session_id),
-        daemon=True
-    ).start()
+            await asyncio.wait_for(done.wait(), wait_ms / 1000)
+        except asyncio.TimeoutError:
+            pass
+        else:
+            res = await result_store.get(trace_id)
+            if res:
+                return {**res, "trace_id": trace_id, "session_id": session_id}
 
     return {"trace_id": trace_id, "session_id": session_id, "status": "accepted"}
 
 
+@app.post("/eval", tags=["feedback"])
+async def submit_eval(payload: EvalRequest):
+    """Record a user rating for a finished trace."""
+    eval_id = await submit_evaluation(payload.trace_id, payload.user_id, payload.rating, payload.comments)
+    return {"eval_id": eval_id}
+
+
+async def _await_result(trace_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+    """Finished result (or error) for the trace, or None if not ready within `timeout`."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    delay = 0.25
+    while True:
+        res = await result_store.get(trace_id)
+        if res and res.get("status") != "processing":
+            return res
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return None
+        done = _done_events.get(trace_id)
+        if done is not None:
+            try:
+                await asyncio.wait_for(done.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+        else:
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, 2.0)
+
+
 @app.get("/result/{trace_id}", tags=["ingest"])
-def get_result(trace_id: str):
-    res = result_store.get(trace_id)
+async def get_result(trace_id: str, wait: float = 0):
+    """
+    Current state of a trace. With `wait` (seconds, capped at
+    RESULT_STREAM_TIMEOUT_SEC) this long-polls: the request is held until
+    the result is ready, or answered 204 if it is still running by then.
+    """
+    if wait > 0:
+        res = await _await_result(trace_id, min(wait, RESULT_STREAM_TIMEOUT_SEC))
+        if res is None:
+            return Response(status_code=204)
+        return res
+    res = await result_store.get(trace_id)
     if not res:
         return {"status": "processing", "message": "Result not found or not ready."}
     return res
 
 
+@app.get("/result/{trace_id}/stream", tags=["ingest"])
+async def stream_result(trace_id: str):
+    """
+    Server-sent events for one trace:
+    - `event: progress` with the stored partial result each time the
+      orchestration reaches a new stage (see `orchestrate(on_progress=)`),
+    - `event: done` with the final result, or the processing status after
+      RESULT_STREAM_TIMEOUT_SEC,
+    - `: keep-alive` comments every SSE_KEEPALIVE_SEC while waiting.
+
+    Traces started by this worker wake on their update event; others
+    (another worker, shared Redis store) fall back to a backed-off store poll.
+    """
+    async def events():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + RESULT_STREAM_TIMEOUT_SEC
+        next_keepalive = loop.time() + SSE_KEEPALIVE_SEC
+        delay = 0.25
+        sent_progress = None
+        while True:
+            local = trace_id in _done_events
+            update = _update_events.setdefault(trace_id, asyncio.Event()) if local else None
+            res = await result_store.get(trace_id)
+            if res and res.get("status") != "processing":
+                break
+            if res and "stage" in res:
+                progress = (res["stage"], res["partial"].get("months_ready"))
+                if progress != sent_progress:
+                    sent_progress = progress
+                    yield b"event: progress\ndata: " + orjson.dumps(res) + b"\n\n"
+            now = loop.time()
+            remaining = deadline - now
+            if remaining <= 0:
+                res = res or {"status": "processing", "message": "Result not found or not ready."}
+                break
+            if now >= next_keepalive:
+                yield b": keep-alive\n\n"
+                next_keepalive = now + SSE_KEEPALIVE_SEC
+            if update is not None:
+                try:
+                    await asyncio.wait_for(update.wait(), min(remaining, next_keepalive - now))
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                await asyncio.sleep(min(delay, remaining))
+                delay = min(delay * 2, 2.0)
+        yield b"event: done\ndata: " + orjson.dumps(res) + b"\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/debug/pool", tags=["observability"])
+def debug_pool():
+    from .database import async_engine
+    return {"async_pool": async_engine.pool.status()}
+
+
 @app.get("/metrics", tags=["observability"])
 def metrics():
     from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
@@ -329,8 +505,8 @@ def metrics():
 
 # --- Audio Endpoint ---
 
-from fastapi import UploadFile, File
-from .audio import transcriber
+from fastapi import UploadFile, File, WebSocket, WebSocketDisconnect
+from .audio import transcriber, StreamingTranscriber
 
 @app.post("/transcribe", tags=["audio"])
 async def transcribe_audio(file: UploadFile = File(...)):
@@ -340,17 +516,16 @@ async def transcribe_audio(file: UploadFile = File(...)):
     2. Structure with Llama 3 (via Groq).
     """
     try:
-        # 1. Read & Transcribe
-        content = await file.read()
-        file_obj = io.BytesIO(content)
-        raw_text = transcriber.transcribe(file_obj)
+        # 1. Transcribe straight from the spooled upload (no in-memory copy);
+        # the Groq call blocks, so keep it off the event loop.
+        raw_text = await asyncio.to_thread(transcriber.transcribe, file.file, file.filename or "input.wav")
         
         if "[Error" in raw_text:
             return JSONResponse(status_code=500, content={"error": raw_text})
 
         # 2. Structure with LLM
         # We reuse the orchestrator's helper or call_llm directly
-        from .llm import call_llm
+        from .llm import acall_llm
         from .prompts import build_prompt
         from .orchestrator import _parse_json
         
@@ -359,7 +534,7 @@ async def transcribe_audio(file: UploadFile = File(...)):
         prompt_text = build_prompt("StructureAgent", {"focus": raw_text}, None)
         
         logger.info("Structuring transcript with Groq...")
-        structured_json_str = call_llm(prompt_text, max_tokens=2000, model_override="llama-3.3-70b-versatile")
+        structured_json_str = await acall_llm(prompt_text, max_tokens=2000, model_override="llama-3.3-70b-versatile")
         structured_data = _parse_json(structured_json_str)
         
         # If LLM failed to structure, fallback to raw text in 'focus'
@@ -382,3 +557,45 @@ async def transcribe_audio(file: UploadFile = File(...)):
     except Exception as e:
         logger.error(f"Audio processing failed: {e}")
         return JSONResponse(status_code=500, content={"error": str(e)})
+
+
+@app.websocket("/transcribe/stream")
+async def transcribe_stream(ws: WebSocket):
+    """
+    Incremental transcription for long recordings.
+    Client sends binary PCM16 16 kHz mono frames (100-2000 ms each) and the
+    text frame "end" when done. Server replies with
+    {"type": "partial", "text": ...} as words are confirmed and a closing
+    {"type": "final", "text": <full transcript>}.
+    """
+    await ws.accept()
+    if not transcriber.enabled:
+        await ws.send_json({"type": "error", "error": "Groq API Key missing"})
+        await ws.close()
+        return
+
+    stream = StreamingTranscriber(transcriber)
+    try:
+        while True:
+            msg = await ws.receive()
+            if msg["type"] == "websocket.disconnect":
+                return
+            if msg.get("bytes"):
+                stream.insert_audio(msg["bytes"])
+                if stream.ready():
+                    confirmed = await asyncio.to_thread(stream.process)
+                    if confirmed:
+                        await ws.send_json({"type": "partial", "text": confirmed})
+            elif msg.get("text") == "end":
+                tail = await asyncio.to_thread(stream.finish)
+                if tail:
+                    await ws.send_json({"type": "partial", "text": tail})
+                await ws.send_json({"type": "final", "text": stream.text})
+                await ws.close()
+                return
+    except WebSocketDisconnect:
+        return
+    except Exception as e:
+        logger.error(f"Streaming transcription failed: {e}")
+        await ws.send_json({"type": "error", "error": str(e)})
+        await ws.close()
@@ -18,12 +18,12 @@ Adding new tools:
 
 import os
 import time
-import uuid
-from collections import defaultdict, deque
-from typing import Any, Callable, Deque, Dict
+from typing import Any, Callable, Dict, List
 
 from loguru import logger
 
+from .log import ctx, log
+from .observability import new_request_id
 from .tools import sentiment_tool, tts_tool
 
 
@@ -33,21 +33,34 @@ TOOLS_REGISTRY: Dict[str, Callable[..., Any]] = {
 }
 
 
+_WINDOW_NS = 60_000_000_000
+
+
 class RateLimiter:
+    """
+    Sliding 60 s window per key, kept as a ring of the last `max` accepted
+    call times. The slot at `head` is the oldest of them, so a call is
+    allowed iff that slot has aged out of the window: one comparison, no loop.
+    """
+
     def __init__(self, max_per_minute: int = 60) -> None:
         self.max = max_per_minute
-        self.calls: Dict[str, Deque[float]] = defaultdict(deque)
+        # key -> [ring of monotonic_ns timestamps, head index]
+        self.calls: Dict[str, List[Any]] = {}
 
     def allow(self, key: str) -> bool:
-        now = time.time()
-        window_start = now - 60.0
-        dq = self.calls[key]
-        while dq and dq[0] < window_start:
-            dq.popleft()
-        if len(dq) < self.max:
-            dq.append(now)
-            return True
-        return False
+        if self.max <= 0:
+            return False
+        now = time.monotonic_ns()
+        entry = self.calls.get(key)
+        if entry is None:
+            entry = self.calls[key] = [[-_WINDOW_NS] * self.max, 0]
+        ring, head = entry
+        if now - ring[head] < _WINDOW_NS:
+            return False
+        ring[head] = now
+        entry[1] = (head + 1) % self.max
+        return True
 
 
 _rate_limit = RateLimiter(
@@ -65,25 +78,27 @@ def call_tool(tool_name: str, payload: Dict[str, Any]) -> Any:
 
     Returns tool-specific JSON-serializable output.
     """
-    request_id = str(uuid.uuid4())
-    log = logger.bind(request_id=request_id, tool=tool_name)
-
-    if not _rate_limit.allow(tool_name):
-        log.warning("rate_limit_exceeded")
-        raise RuntimeError("Rate limit exceeded for tool")
-
-    fn = TOOLS_REGISTRY.get(tool_name)
-    if not fn:
-        log.error("unknown_tool")
-        raise ValueError(f"Unknown tool: {tool_name}")
-
-    log.info("tool_call_start")
+    token = ctx.set({"request_id": new_request_id(), "tool": tool_name})
     try:
-        # Expect a single text parameter for these tools
-        text = str(payload.get("text", ""))
-        result = fn(text)
-        log.info("tool_call_success")
-        return result
-    except Exception:
-        log.exception("tool_call_error")
-        raise
\ No newline at end of file
+        if not _rate_limit.allow(tool_name):
+            log("rate_limit_exceeded", level="WARNING")
+            raise RuntimeError("Rate limit exceeded for tool")
+
+        fn = TOOLS_REGISTRY.get(tool_name)
+        if not fn:
+            log("unknown_tool", level="ERROR")
+            raise ValueError(f"Unknown tool: {tool_name}")
+
+        log("tool_call_start")
+        try:
+            # Expect a single text parameter for these tools
+            text = str(payload.get("text", ""))
+            result = fn(text)
+            log("tool_call_success")
+            return result
+        except Exception:
+            # Rare path: keep loguru here for the formatted traceback.
+            logger.bind(**ctx.get()).exception("tool_call_error")
+            raise
+    finally:
+        ctx.reset(token)
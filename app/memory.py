@@ -4,41 +4,114 @@ Simple SQLite + FAISS memory module.
 Functions:
 - initialize_memory(db_path='memory.db')
 - add_memory(user_id, text, summary, embedding, db_path='memory.db')
+- add_memories_bulk(user_id, [(text, summary, embedding), ...], db_path='memory.db')
 - search_memory(user_id, query_embedding, top_k=3, db_path='memory.db')
+- search_memory_batch(user_id, [query_embedding, ...], top_k=3, db_path='memory.db')
 - compress_summary(text) -> 1-2 sentence plain text via LLM
+- flush_indexes() -> write any pending FAISS index changes to disk
+- migrate_embeddings_to_blob(db_path='memory.db') -> convert legacy JSON rows
+
+FAISS indexes are loaded once per (user_id, db_path) and kept in memory;
+writes to the .faiss file happen on a background writer thread, debounced,
+and are flushed at exit.
 """
 
+import atexit
 import os
 import json
+import queue
 import sqlite3
+import threading
 import time
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 from loguru import logger
 
+try:
+    import numpy as np  # type: ignore
+except ImportError:
+    np = None
+try:
+    import faiss  # type: ignore
+except ImportError:
+    faiss = None
+
 from .llm import call_llm
+from .sqlite_pool import get_connection, get_read_connection, transaction
+
+
+# Seconds to wait after an add before writing the index, so bursts coalesce.
+PERSIST_DELAY_SEC = 2.0
+
+_INDEX_CACHE: Dict[Tuple[str, str], Any] = {}
+_DIRTY: Set[Tuple[str, str]] = set()
+_index_lock = threading.RLock()
+
+# Vectors are L2-normalized, so inner product == cosine similarity.
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 80
+HNSW_EF_SEARCH = 64
+
+# Users with at least QUANTIZE_THRESHOLD memories get a compressed index built
+# from this faiss.index_factory spec (e.g. "IVF128,PQ32"); "HNSW" keeps every
+# user on the exact-vector HNSW index.
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "HNSW")
+QUANTIZE_THRESHOLD = int(os.getenv("FAISS_QUANTIZE_THRESHOLD", "1000"))
+IVF_NPROBE = int(os.getenv("FAISS_NPROBE", "8"))
+
+# Wakes the writer thread; items are (user_id, db_path) keys, coalesced via _DIRTY.
+_write_queue: "queue.Queue[Tuple[str, str]]" = queue.Queue()
+# Serializes index file writes and deletes, so a delete cannot be undone by a
+# write of an index snapshot taken just before it.
+_file_lock = threading.Lock()
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS memories (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  user_id TEXT NOT NULL,
+  text TEXT NOT NULL,
+  summary TEXT NOT NULL,
+  embedding BLOB NOT NULL,
+  ts INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_memories_user ON memories(user_id);
+"""
+
+
+# Statement texts are module constants so every call hands sqlite3 the
+# identical string and hits the connection's prepared-statement cache.
+_SQL_INSERT_MEMORY = "INSERT INTO memories (user_id, text, summary, embedding, ts) VALUES (?,?,?,?,?) RETURNING id"
+_SQL_SELECT_USER_EMBEDDINGS = "SELECT id, embedding FROM memories WHERE user_id=?"
+_SQL_SELECT_TEXT_EMBEDDINGS = "SELECT id, embedding FROM memories WHERE typeof(embedding)='text'"
+_SQL_UPDATE_EMBEDDING = "UPDATE memories SET embedding=? WHERE id=?"
+_SQL_DELETE_USER = "DELETE FROM memories WHERE user_id=?"
+_SQL_COUNT_USER = "SELECT COUNT(*) FROM memories WHERE user_id=?"
+_SQL_SELECT_SUMMARIES: Dict[int, str] = {}
+
+
+def _select_summaries_sql(n: int) -> str:
+    """SELECT for exactly `n` ids; one cached text per distinct top_k."""
+    sql = _SQL_SELECT_SUMMARIES.get(n)
+    if sql is None:
+        placeholders = ",".join("?" * n)
+        sql = _SQL_SELECT_SUMMARIES[n] = f"SELECT id, summary FROM memories WHERE user_id=? AND id IN ({placeholders})"
+    return sql
+
+
+def _conn(db_path: str) -> sqlite3.Connection:
+    return get_connection(db_path, _SCHEMA)
+
+
+def _read_conn(db_path: str) -> sqlite3.Connection:
+    # Per-thread handle: never sees another thread's uncommitted writes.
+    return get_read_connection(db_path, _SCHEMA)
 
 
 def initialize_memory(db_path: str = "memory.db") -> None:
     os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
-    conn = sqlite3.connect(db_path)
-    try:
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS memories (
-              id INTEGER PRIMARY KEY AUTOINCREMENT,
-              user_id TEXT NOT NULL,
-              text TEXT NOT NULL,
-              summary TEXT NOT NULL,
-              embedding TEXT NOT NULL,
-              ts INTEGER NOT NULL
-            )
-            """
-        )
-        conn.commit()
-        logger.info("memory_initialized", extra={"db_path": db_path})
-    finally:
-        conn.close()
+    _conn(db_path)
+    logger.info("memory_initialized", extra={"db_path": db_path})
 
 
 def _index_path(user_id: str, db_path: str) -> str:
@@ -46,92 +119,241 @@ def _index_path(user_id: str, db_path: str) -> str:
     return f"{base}_{user_id}.faiss"
 
 
-def _load_index(user_id: str, dim: Optional[int], db_path: str):
+def _new_index(dim: int):
+    hnsw = faiss.IndexHNSWFlat(dim, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+    hnsw.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    hnsw.hnsw.efSearch = HNSW_EF_SEARCH
+    return faiss.IndexIDMap2(hnsw)
+
+
+def _normalized(vectors: List[List[float]]):
+    vecs = np.ascontiguousarray(vectors, dtype=np.float32)
+    faiss.normalize_L2(vecs)
+    return vecs
+
+
+def _encode_embedding(embedding: List[float]) -> bytes:
+    return np.ascontiguousarray(embedding, dtype=np.float32).tobytes()
+
+
+def _decode_embedding(value: Any):
+    """float32 array from a stored embedding (BLOB, or JSON text from older rows)."""
+    if isinstance(value, str):
+        return np.asarray(json.loads(value), dtype=np.float32)
+    return np.frombuffer(value, dtype=np.float32)
+
+
+def migrate_embeddings_to_blob(db_path: str = "memory.db") -> int:
+    """Rewrite JSON-encoded embeddings as float32 BLOBs; returns rows converted."""
+    with transaction(db_path, _SCHEMA) as conn:
+        rows = conn.execute(_SQL_SELECT_TEXT_EMBEDDINGS).fetchall()
+        conn.executemany(
+            _SQL_UPDATE_EMBEDDING,
+            [(_decode_embedding(emb).tobytes(), rid) for rid, emb in rows],
+        )
+    logger.info("memory_embeddings_migrated", extra={"db_path": db_path, "count": len(rows)})
+    return len(rows)
+
+
+def _wants_quantized(count: int) -> bool:
+    return FAISS_INDEX_TYPE.upper() != "HNSW" and count >= QUANTIZE_THRESHOLD
+
+
+def _is_quantized(index) -> bool:
+    return not isinstance(index, faiss.IndexIDMap2)
+
+
+def _new_quantized_index(dim: int, vecs):
+    """Train a FAISS_INDEX_TYPE index (inner product) on the user's normalized vectors."""
+    index = faiss.index_factory(dim, FAISS_INDEX_TYPE, faiss.METRIC_INNER_PRODUCT)
+    index.train(vecs)
     try:
-        import faiss  # type: ignore
-    except Exception:
-        logger.warning("faiss-cpu not found. Memory features will be disabled.")
-        return None
+        faiss.extract_index_ivf(index).nprobe = IVF_NPROBE
+    except RuntimeError:
+        pass  # not an IVF spec
+    return index
+
 
-    path = _index_path(user_id, db_path)
-    if os.path.exists(path):
-        return faiss.read_index(path)
+def _rebuild_index(user_id: str, dim: Optional[int], db_path: str):
+    """Build a fresh cosine index from the embeddings stored in SQLite."""
+    rows = _read_conn(db_path).execute(_SQL_SELECT_USER_EMBEDDINGS, (user_id,)).fetchall()
+    vectors = [_decode_embedding(r[1]) for r in rows]
+    if vectors:
+        dim = len(vectors[0])
     if dim is None:
         raise RuntimeError("Embedding dimension required to create new FAISS index")
-    index = faiss.IndexFlatL2(dim)
-    id_index = faiss.IndexIDMap(index)
-    return id_index
+    vecs = _normalized(vectors) if vectors else None
+    index = _new_quantized_index(dim, vecs) if _wants_quantized(len(vectors)) else _new_index(dim)
+    if vectors:
+        index.add_with_ids(vecs, np.array([r[0] for r in rows], dtype=np.int64))
+    logger.info("memory_index_rebuilt", extra={"user_id": user_id, "count": len(vectors)})
+    return index
+
+
+def _load_index(user_id: str, dim: Optional[int], db_path: str):
+    if faiss is None:
+        logger.warning("faiss-cpu not found. Memory features will be disabled.")
+        return None
+
+    key = (user_id, db_path)
+    with _index_lock:
+        index = _INDEX_CACHE.get(key)
+        if index is not None:
+            return index
+        path = _index_path(user_id, db_path)
+        index = faiss.read_index(path) if os.path.exists(path) else None
+        if (
+            index is None
+            or index.metric_type != faiss.METRIC_INNER_PRODUCT
+            or index.ntotal != _read_conn(db_path).execute(_SQL_COUNT_USER, (user_id,)).fetchone()[0]
+        ):
+            # No index yet, a legacy L2 one, or a file that missed adds
+            # committed before a crash: (re)build from SQLite.
+            index = _rebuild_index(user_id, dim, db_path)
+            _DIRTY.add(key)
+        _INDEX_CACHE[key] = index
+        return index
 
 
 def _persist_index(index, user_id: str, db_path: str) -> None:
-    try:
-        import faiss  # type: ignore
-    except Exception:
+    """Mark the cached index dirty and hand the write to the writer thread."""
+    key = (user_id, db_path)
+    with _index_lock:
+        _DIRTY.add(key)
+    _write_queue.put_nowait(key)
+
+
+def _writer_loop() -> None:
+    while True:
+        _write_queue.get()
+        # Let a burst of adds land, then write each dirty index once.
+        time.sleep(PERSIST_DELAY_SEC)
+        try:
+            while True:
+                _write_queue.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            flush_indexes()
+        except Exception:
+            logger.exception("memory_index_flush_failed")
+
+
+def flush_indexes() -> None:
+    if faiss is None:
         return
-    path = _index_path(user_id, db_path)
-    faiss.write_index(index, path)
+    with _file_lock:
+        with _index_lock:
+            # Snapshot under the index lock; the slow disk write happens outside it.
+            pending = [
+                (key, faiss.serialize_index(_INDEX_CACHE[key]))
+                for key in _DIRTY
+                if key in _INDEX_CACHE
+            ]
+            _DIRTY.clear()
+        for (user_id, db_path), data in pending:
+            path = _index_path(user_id, db_path)
+            tmp = f"{path}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data.tobytes())
+            os.replace(tmp, path)
+
+
+_writer = threading.Thread(target=_writer_loop, name="faiss-writer", daemon=True)
+_writer.start()
+atexit.register(flush_indexes)
 
 
 def add_memory(user_id: str, text: str, summary: str, embedding: List[float], db_path: str = "memory.db") -> int:
+    return add_memories_bulk(user_id, [(text, summary, embedding)], db_path=db_path)[0]
+
+
+def add_memories_bulk(user_id: str, items: List[Tuple[str, str, List[float]]], db_path: str = "memory.db") -> List[int]:
+    """
+    Insert several memories in one transaction and one FAISS add.
+    `items` are (text, summary, embedding); empty summaries are generated.
+    Returns the new row ids in input order.
+    """
+    if not items:
+        return []
     ts = int(time.time())
-    conn = sqlite3.connect(db_path)
-    try:
-        if not summary:
-            summary = compress_summary(text)
-        emb_json = json.dumps(embedding)
-        cur = conn.execute(
-            "INSERT INTO memories (user_id, text, summary, embedding, ts) VALUES (?,?,?,?,?)",
-            (user_id, text, summary, emb_json, ts),
-        )
-        row_id = cur.lastrowid
-        conn.commit()
+    if np is None:
+        raise RuntimeError("numpy is required for FAISS operations")
 
-        try:
-            import numpy as np  # type: ignore
-        except Exception:
-            raise RuntimeError("numpy is required for FAISS operations")
+    # Load (or rebuild) the index before inserting, so a rebuild from SQLite
+    # cannot pick up the new rows and index them twice.
+    index = _load_index(user_id, len(items[0][2]), db_path)
 
-        dim = len(embedding)
-        index = _load_index(user_id, dim, db_path)
-        if index is not None:
-            vec = np.array([embedding], dtype=np.float32)
-            ids = np.array([row_id], dtype=np.int64)
-            index.add_with_ids(vec, ids)
-            _persist_index(index, user_id, db_path)
-        logger.info("memory_added", extra={"user_id": user_id, "row_id": row_id})
-        return int(row_id)
-    finally:
-        conn.close()
+    rows = [
+        (user_id, text, summary or compress_summary(text), _encode_embedding(embedding), ts)
+        for text, summary, embedding in items
+    ]
+    vecs = _normalized([embedding for _, _, embedding in items]) if index is not None else None
+    key = (user_id, db_path)
+    indexed = False
+    try:
+        # One critical section: if the FAISS add fails the INSERTs roll back,
+        # so SQLite never holds rows the in-memory index is missing.
+        with transaction(db_path, _SCHEMA) as conn:
+            row_ids = [int(conn.execute(_SQL_INSERT_MEMORY, row).fetchone()[0]) for row in rows]
+            if index is not None:
+                with _index_lock:
+                    index.add_with_ids(vecs, np.array(row_ids, dtype=np.int64))
+                indexed = True
+    except BaseException:
+        if indexed:
+            # COMMIT failed after the add: drop the index so the next load
+            # rebuilds it from what SQLite actually holds.
+            with _index_lock:
+                _INDEX_CACHE.pop(key, None)
+                _DIRTY.discard(key)
+        raise
+
+    if index is not None:
+        with _index_lock:
+            if _wants_quantized(index.ntotal) and not _is_quantized(index):
+                # Crossed the threshold: retrain a compressed index from SQLite.
+                index = _INDEX_CACHE[key] = _rebuild_index(user_id, None, db_path)
+        _persist_index(index, user_id, db_path)
+    logger.info("memories_added", extra={"user_id": user_id, "count": len(row_ids)})
+    return row_ids
 
 
 def search_memory(user_id: str, query_embedding: List[float], top_k: int = 3, db_path: str = "memory.db") -> List[str]:
-    try:
-        import numpy as np  # type: ignore
-    except Exception:
+    return search_memory_batch(user_id, [query_embedding], top_k=top_k, db_path=db_path)[0]
+
+
+def search_memory_batch(user_id: str, query_embeddings: List[List[float]], top_k: int = 3, db_path: str = "memory.db") -> List[List[str]]:
+    """
+    Search several queries for one user with a single FAISS call and a single
+    SELECT. Returns one list of summaries (best first) per query, in order.
+    """
+    if np is None:
         raise RuntimeError("numpy is required for FAISS operations")
 
-    index = _load_index(user_id, len(query_embedding), db_path)
-    if index is None or getattr(index, "ntotal", 0) == 0:
+    if not query_embeddings:
         return []
+    empty: List[List[str]] = [[] for _ in query_embeddings]
+    index = _load_index(user_id, len(query_embeddings[0]), db_path)
+    if index is None or getattr(index, "ntotal", 0) == 0:
+        return empty
 
-    q = np.array([query_embedding], dtype=np.float32)
-    distances, ids = index.search(q, top_k)
-    ids_list = [int(i) for i in ids[0] if int(i) != -1]
+    q = _normalized(query_embeddings)
+    with _index_lock:
+        distances, ids = index.search(q, top_k)
+    ranked = [[int(i) for i in row if int(i) != -1] for row in ids]
 
-    conn = sqlite3.connect(db_path)
-    try:
-        summaries: List[str] = []
-        for rid in ids_list:
-            cur = conn.execute(
-                "SELECT summary FROM memories WHERE id=? AND user_id=?",
-                (rid, user_id),
-            )
-            row = cur.fetchone()
-            if row:
-                summaries.append(row[0])
-        return summaries
-    finally:
-        conn.close()
+    unique_ids = list({i for row in ranked for i in row})
+    if not unique_ids:
+        return empty
+    # Pad to the batch capacity (-1 never matches a rowid) so the SQL text
+    # only varies with len(queries) * top_k.
+    n = len(query_embeddings) * top_k
+    padded = unique_ids + [-1] * (n - len(unique_ids))
+    rows = _read_conn(db_path).execute(_select_summaries_sql(n), (user_id, *padded)).fetchall()
+    by_id = dict(rows)
+    # Keep FAISS rank order per query.
+    return [[by_id[i] for i in row if i in by_id] for row in ranked]
 
 
 def compress_summary(text: str) -> str:
@@ -149,18 +371,18 @@ def compress_summary(text: str) -> str:
 
 
 def delete_user_data(user_id: str, db_path: str = "memory.db") -> int:
-    conn = sqlite3.connect(db_path)
-    try:
-        cur = conn.execute("DELETE FROM memories WHERE user_id=?", (user_id,))
-        conn.commit()
-        count = cur.rowcount if cur.rowcount is not None else 0
+    with transaction(db_path, _SCHEMA) as conn:
+        cur = conn.execute(_SQL_DELETE_USER, (user_id,))
+    count = cur.rowcount if cur.rowcount is not None else 0
+    with _file_lock:
+        with _index_lock:
+            _INDEX_CACHE.pop((user_id, db_path), None)
+            _DIRTY.discard((user_id, db_path))
         try:
             path = _index_path(user_id, db_path)
             if os.path.exists(path):
                 os.remove(path)
         except Exception:
             pass
-        logger.info("memory_user_deleted", extra={"user_id": user_id, "count": count})
-        return int(count)
-    finally:
-        conn.close()
\ No newline at end of file
+    logger.info("memory_user_deleted", extra={"user_id": user_id, "count": count})
+    return int(count)
\ No newline at end of file
@@ -1,3 +1,5 @@
+import itertools
+import os
 import sys
 import time
 from typing import Any, Dict
@@ -29,14 +31,23 @@ AGENT_LATENCY = Histogram(
 )
 
 
+# Log-correlation ids only need to be unique within this process's logs; the
+# start time and pid keep them apart across restarts and workers.
+_PROC_ID = f"{int(time.time()):x}-{os.getpid():x}"
+_COUNTER = itertools.count()
+
+
+def new_request_id() -> str:
+    return f"{_PROC_ID}-{next(_COUNTER):x}"
+
+
+_REDACT_KEYS = frozenset({"user_id", "text", "comments"})
+
+
 def _redact(payload: Dict[str, Any]) -> Dict[str, Any]:
-    redacted = {}
-    for k, v in payload.items():
-        if k in {"user_id", "text", "comments"}:
-            redacted[k] = "[redacted]"
-        else:
-            redacted[k] = v
-    return redacted
+    if payload.keys().isdisjoint(_REDACT_KEYS):
+        return payload
+    return payload | dict.fromkeys(_REDACT_KEYS & payload.keys(), "[redacted]")
 
 
 def trace_request(req_id: str, event: str, payload: Dict[str, Any]) -> None:
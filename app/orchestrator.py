@@ -1,32 +1,58 @@
 import asyncio
 import json
-import uuid
 import time
-from typing import Any, Dict, Optional, List
+from typing import Any, Awaitable, Callable, Dict, Optional, List
 
+import orjson
 from loguru import logger
 
-from .prompts import build_prompt
-from .llm import call_llm, create_embedding
-from .vector_store import vector_store
-from .observability import AGENT_CALLS_TOTAL, AgentTimer, trace_request
+from .prompts import build_messages
+from .llm import acall_llm, acall_llm_batch
+from .embedding_cache import aget_or_compute as embed_cached
+from .vector_store import get_vector_store
+from .observability import AGENT_CALLS_TOTAL, AgentTimer, new_request_id, trace_request
 
 
 import re
 
+_JSON_DECODER = json.JSONDecoder()
+
+# Vector-store writes pushed off the request path. The loop only keeps weak
+# references to tasks, so hold them here until they finish.
+_background: "set[asyncio.Task]" = set()
+
+
+def _on_background_done(task: asyncio.Task) -> None:
+    _background.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.opt(exception=task.exception()).error("background_write_failed")
+
+
+def _spawn_background(fn: Callable[..., Any], *args: Any) -> None:
+    """Run a blocking write in a worker thread without awaiting it."""
+    task = asyncio.create_task(asyncio.to_thread(fn, *args))
+    _background.add(task)
+    task.add_done_callback(_on_background_done)
+
+
+async def drain_background() -> None:
+    """Wait for pending background writes (called on shutdown)."""
+    await asyncio.gather(*_background, return_exceptions=True)
+
+
 def _parse_json(text: str) -> Dict[str, Any]:
     # Strip <think>...</think> blocks from reasoning models like DeepSeek-R1
     text = re.sub(r'<think>.*?</think>', '', text, flags=re.DOTALL)
     
     try:
-        return json.loads(text)
-    except json.JSONDecodeError:
-        # Fallback: try to find start/end brackets
+        return orjson.loads(text)
+    except orjson.JSONDecodeError:
+        # Fallback: decode one object starting at the first brace, ignoring
+        # any prose or code fences around it (single pass, no substring copy).
         start = text.find("{")
-        end = text.rfind("}")
-        if start != -1 and end != -1 and end > start:
+        if start != -1:
             try:
-                return json.loads(text[start : end + 1])
+                return _JSON_DECODER.raw_decode(text, start)[0]
             except json.JSONDecodeError:
                 pass
         # Final fallback: return raw text wrapped in dict
@@ -36,14 +62,14 @@ def _parse_json(text: str) -> Dict[str, Any]:
 async def _call_agent(agent_name: str, inputs: Dict[str, str], context: Optional[Dict[str, Any]], model_override: Optional[str] = None) -> Dict[str, Any]:
     try:
         # Build prompt with specific inputs and retrieved context
-        prompt_text = build_prompt(agent_name, inputs, context)
+        system, prompt_text = build_messages(agent_name, inputs, context)
         
         timer = AgentTimer(agent_name)
         AGENT_CALLS_TOTAL.labels(agent=agent_name).inc()
         
         logger.info(f"Calling agent: {agent_name}")
-        # Call LLM (IO bound, run in thread). Use 8000 tokens to ensure the 6-month plan fits.
-        text = await asyncio.to_thread(call_llm, prompt_text, max_tokens=8000, model_override=model_override)
+        # Use 8000 tokens to ensure the 6-month plan fits.
+        text = await acall_llm(prompt_text, system, max_tokens=8000, model_override=model_override)
         
         timer.observe()
         data = _parse_json(text)
@@ -53,12 +79,35 @@ async def _call_agent(agent_name: str, inputs: Dict[str, str], context: Optional
         return {"agent": agent_name, "error": str(e)}
 
 
+async def _call_agents(agent_names: List[str], inputs: Dict[str, str], context: Optional[Dict[str, Any]], model_override: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Run independent agents as one concurrent LLM batch; results in input order."""
+    systems, prompts = zip(*(build_messages(name, inputs, context) for name in agent_names))
+    timers = []
+    for name in agent_names:
+        AGENT_CALLS_TOTAL.labels(agent=name).inc()
+        timers.append(AgentTimer(name))
+
+    logger.info(f"Calling agents: {', '.join(agent_names)}")
+    texts = await acall_llm_batch(list(prompts), max_tokens=8000, model_override=model_override, systems=list(systems))
+
+    results = []
+    for name, timer, text in zip(agent_names, timers, texts):
+        timer.observe()
+        if isinstance(text, BaseException):
+            logger.opt(exception=text).error(f"Error in _call_agents for {name}")
+            results.append({"agent": name, "error": str(text)})
+        else:
+            results.append(_parse_json(text))
+    return results
+
+
 async def orchestrate(
     user_id: str,
     focus: str,
     history: str,
     vision: str,
-    session_id: Optional[str] = None
+    session_id: Optional[str] = None,
+    on_progress: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None,
 ) -> Dict[str, Any]:
     """
     Main v2.0 Pipeline:
@@ -67,9 +116,13 @@ async def orchestrate(
     3. Run Agents in Parallel (Past, Present, Future).
     4. Run Integration Agent (with Constraint Logic).
     5. Save new memory.
+
+    `on_progress(stage, partial)` is awaited as stages finish: "analysis"
+    once Past/Present/Future are in, then "roadmap" after each month.
     """
-    trace_id = str(uuid.uuid4())
+    trace_id = new_request_id()
     log = logger.bind(trace_id=trace_id, user_id=user_id)
+    vector_store = get_vector_store()
     
     # Combined text for embedding (Capture the "Vibe")
     combined_input = f"{focus} {history} {vision}"
@@ -84,7 +137,7 @@ async def orchestrate(
         retrieved_memories = []
         embedding = []
         try:
-            embedding = await asyncio.to_thread(create_embedding, combined_input)
+            embedding = await embed_cached(combined_input)
             if embedding:
                 # Retrieve top 3 past memories
                 hits = await asyncio.to_thread(vector_store.search_memories, user_id, embedding, 3)
@@ -109,11 +162,24 @@ async def orchestrate(
         # Past -> Pattern Hunter
         # Present -> Constraint Analyst
         # Future -> Scenario Simulator
-        past_task = _call_agent("PastPatternAgent", inputs, memory_context)
-        present_task = _call_agent("PresentConstraintAgent", inputs, memory_context)
-        future_task = _call_agent("FutureSimulatorAgent", inputs, memory_context)
-
-        past, present, future = await asyncio.gather(past_task, present_task, future_task)
+        # Semantic response cache: an input this user has (nearly) written
+        # before reuses the stored agent outputs instead of new LLM calls.
+        agent_names = ["PastPatternAgent", "PresentConstraintAgent", "FutureSimulatorAgent"]
+        cached: Dict[str, Dict[str, Any]] = {}
+        if embedding:
+            cached = await asyncio.to_thread(vector_store.lookup_responses, user_id, agent_names, embedding)
+            if cached:
+                log.info(f"Response cache hit for {', '.join(cached)}")
+        missing = [name for name in agent_names if name not in cached]
+        fresh = dict(zip(missing, await _call_agents(missing, inputs, memory_context))) if missing else {}
+        if embedding:
+            cacheable = {name: out for name, out in fresh.items() if "error" not in out}
+            if cacheable:
+                _spawn_background(vector_store.store_responses, user_id, embedding, cacheable)
+        past, present, future = (cached[name] if name in cached else fresh[name] for name in agent_names)
+        partial = {"past": past, "present": present, "future": future}
+        if on_progress:
+            await on_progress("analysis", partial)
 
         # 3. Integration (The Architect) - Iterative Generation
         # ---------------------------------------------------
@@ -143,23 +209,30 @@ async def orchestrate(
                  "weeks": []
              })
              
+        if on_progress:
+            await on_progress("roadmap", {**partial, "months_ready": len(integration["roadmap"])})
+
         for month_num in range(2, 7):
+            # Context and inputs only change per month, not per retry.
+            # Only pass the last generated month to keep context small and avoid JSON parsing failures
+            last_month = integration["roadmap"][-1] if integration["roadmap"] else {}
+            month_context = {
+                **integration_context,
+                "current_roadmap_progress": orjson.dumps([last_month]).decode(),
+                "target_month": f"Month {month_num}",
+            }
+
+            # Calculate correct week numbering
+            start_week = (month_num - 1) * 4 + 1
+            end_week = month_num * 4
+
+            month_inputs = {
+                "focus": f"Generate exactly Month {month_num}. You MUST label the weeks sequentially as Week {start_week}, Week {start_week+1}, Week {start_week+2}, and Week {end_week}. Follow the 4-week, 7-day breakdown format."
+            }
+
             success = False
             for attempt in range(2): # Simple retry
                 log.info(f"Iteratively generating Month {month_num} (Attempt {attempt + 1})...")
-                month_context = integration_context.copy()
-                # Only pass the last generated month to keep context small and avoid JSON parsing failures
-                last_month = integration["roadmap"][-1] if integration["roadmap"] else {}
-                month_context["current_roadmap_progress"] = json.dumps([last_month])
-                month_context["target_month"] = f"Month {month_num}"
-                
-                # Calculate correct week numbering
-                start_week = (month_num - 1) * 4 + 1
-                end_week = month_num * 4
-                
-                month_inputs = {
-                    "focus": f"Generate exactly Month {month_num}. You MUST label the weeks sequentially as Week {start_week}, Week {start_week+1}, Week {start_week+2}, and Week {end_week}. Follow the 4-week, 7-day breakdown format."
-                }
                 month_data = await _call_agent("IntegrationMonthAgent", month_inputs, month_context)
                 
                 new_month = None
@@ -184,6 +257,9 @@ async def orchestrate(
                     "weeks": []
                 })
 
+            if on_progress:
+                await on_progress("roadmap", {**partial, "months_ready": len(integration["roadmap"])})
+
         result = {
             "past": past,
             "present": present,
@@ -197,13 +273,13 @@ async def orchestrate(
         if embedding:
             # We save the *Action Plan* and the *Focus* as the memory for next time
             memory_text = f"Focus: {focus}. Plan: {integration.get('impact_statement', '')}"
-            asyncio.create_task(asyncio.to_thread(
-                vector_store.add_memory, 
-                user_id, 
-                memory_text, 
-                embedding, 
-                {"session_id": session_id}
-            ))
+            _spawn_background(
+                vector_store.add_memory,
+                user_id,
+                memory_text,
+                embedding,
+                {"session_id": session_id},
+            )
 
         log.info("orchestrate_success")
         return result
@@ -7,10 +7,13 @@ Agents:
  - IntegrationActionAgent (The Architect)
 """
 
-from typing import Dict, Iterable, Mapping, Optional, Union
+import sys
+from datetime import date
+from types import MappingProxyType
+from typing import Dict, Iterable, Mapping, Optional, Tuple, Union
 
 
-TEMPLATES: Dict[str, str] = {
+_TEMPLATES: Dict[str, str] = {
     "QuestionGeneratorAgent": (
         "You are the 'Context Extraction Engine' in a dynamic, adaptive interview.\n"
         "The user expects questions that build on their previous answers. Real intelligence means Question 2 knows what they said in Question 1.\n"
@@ -263,6 +266,25 @@ TEMPLATES: Dict[str, str] = {
 }
 
 
+# Static parts of every prompt, concatenated once at import.
+_FORMATTING_SUFFIX = (
+    "\n\n--- FORMATTING ---\n"
+    " - Respond with ONLY valid JSON (no code fences).\n"
+    " - Do not include intro/outro text.\n"
+)
+# Read-only views: templates are constants, and the precomposed strings are
+# interned so every build reuses the same objects.
+TEMPLATES: Mapping[str, str] = MappingProxyType({name: sys.intern(base) for name, base in _TEMPLATES.items()})
+_PREFIXES: Mapping[str, str] = MappingProxyType(
+    {name: sys.intern(f"{base}\n\n--- USER INPUTS ---\n") for name, base in TEMPLATES.items()}
+)
+# System messages for `build_messages`: template plus formatting rules, per agent.
+_SYSTEM_PROMPTS: Mapping[str, str] = MappingProxyType(
+    {name: sys.intern(f"{base}{_FORMATTING_SUFFIX}") for name, base in TEMPLATES.items()}
+)
+del _TEMPLATES
+
+
 def get_template(agent_name: str) -> str:
     """Return the base template text for a given agent name."""
     try:
@@ -276,12 +298,19 @@ def _format_context(context_summaries: Optional[Union[Mapping[str, str], Iterabl
     if not context_summaries:
         return "(no additional context)"
     if isinstance(context_summaries, Mapping):
-        parts = []
-        for k, v in context_summaries.items():
-            if v:
-                parts.append(f"### {k}:\n{v}")
-        return "\n\n".join(parts)
-    parts = [f"- {item}" for item in context_summaries]
+        return "\n\n".join([f"### {k}:\n{v}" for k, v in context_summaries.items() if v])
+    return "\n".join(map("- {}".format, context_summaries))
+
+
+def _input_text(inputs: Dict[str, str]) -> str:
+    parts = [f"CURRENT DATE: {date.today().isoformat()}"]
+    if "focus" in inputs:
+        parts.append(f"USER FOCUS (PRESENT): {inputs['focus']}")
+    if "history" in inputs:
+        parts.append(f"USER HISTORY (PAST): {inputs['history']}")
+    if "vision" in inputs:
+        parts.append(f"USER VISION (FUTURE): {inputs['vision']}")
+    parts.append("")
     return "\n".join(parts)
 
 
@@ -297,31 +326,29 @@ def build_prompt(agent_name: str, inputs: Dict[str, str], context_summaries: Opt
     Returns:
       - final prompt string ready to send to the LLM
     """
-    base = get_template(agent_name)
-    
-    # Construct input block
-    import datetime
-    current_date = datetime.datetime.now().strftime("%Y-%m-%d")
-    
-    input_text = f"CURRENT DATE: {current_date}\n"
-    if "focus" in inputs:
-        input_text += f"USER FOCUS (PRESENT): {inputs['focus']}\n"
-    if "history" in inputs:
-        input_text += f"USER HISTORY (PAST): {inputs['history']}\n"
-    if "vision" in inputs:
-        input_text += f"USER VISION (FUTURE): {inputs['vision']}\n"
-        
-    if not input_text:
-        # Fallback for old calls
-        input_text = f"USER ENTRY: {inputs.get('text', '')}"
+    try:
+        prefix = _PREFIXES[agent_name]
+    except KeyError:
+        raise ValueError(f"Unknown agent: {agent_name}")
 
+    input_text = _input_text(inputs)
     context_block = _format_context(context_summaries)
     
-    return (
-        f"{base}\n\n"
-        f"--- USER INPUTS ---\n{input_text}\n\n"
-        f"--- MEMORY CONTEXT ---\n{context_block}\n\n"
-        f"--- FORMATTING ---\n"
-        f" - Respond with ONLY valid JSON (no code fences).\n"
-        f" - Do not include intro/outro text.\n"
-    )
\ No newline at end of file
+    return f"{prefix}{input_text}\n\n--- MEMORY CONTEXT ---\n{context_block}{_FORMATTING_SUFFIX}"
+
+
+def build_messages(agent_name: str, inputs: Dict[str, str], context_summaries: Optional[Union[Mapping[str, str], Iterable[str]]] = None) -> Tuple[str, str]:
+    """
+    Like `build_prompt`, but split into (system, user) for chat APIs.
+
+    The system part is the agent template plus formatting rules: identical on
+    every call for that agent, so it forms a stable prefix the provider's
+    prompt cache can reuse. Only the user part carries per-request text.
+    """
+    try:
+        system = _SYSTEM_PROMPTS[agent_name]
+    except KeyError:
+        raise ValueError(f"Unknown agent: {agent_name}")
+
+    context_block = _format_context(context_summaries)
+    return system, f"--- USER INPUTS ---\n{_input_text(inputs)}\n\n--- MEMORY CONTEXT ---\n{context_block}"
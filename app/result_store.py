@@ -0,0 +1,69 @@
+"""
+Trace result storage for the /ingest -> /result polling flow.
+
+With REDIS_URL set, results live in Redis with a TTL so every API worker
+sees the same traces. Without it, a bounded in-process TTL cache is used
+(single-worker dev), so finished results can no longer pile up forever.
+
+Both stores expose the same async interface:
+- await store.set(trace_id, result)
+- await store.get(trace_id) -> Optional[dict]
+"""
+
+import os
+from typing import Any, Dict, Optional
+
+import orjson
+from cachetools import TTLCache
+from loguru import logger
+
+
+RESULT_TTL_SECONDS = int(os.getenv("RESULT_TTL_SECONDS", "3600"))
+RESULT_CACHE_MAXSIZE = int(os.getenv("RESULT_CACHE_MAXSIZE", "10000"))
+
+
+class MemoryResultStore:
+    def __init__(self, maxsize: int = RESULT_CACHE_MAXSIZE, ttl: int = RESULT_TTL_SECONDS):
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def set(self, trace_id: str, result: Dict[str, Any]) -> None:
+        self._cache[trace_id] = result
+
+    async def get(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        return self._cache.get(trace_id)
+
+    async def close(self) -> None:
+        self._cache.clear()
+
+
+class RedisResultStore:
+    def __init__(self, url: str, ttl: int = RESULT_TTL_SECONDS):
+        import redis.asyncio as redis
+
+        self._redis = redis.Redis.from_url(url)
+        self._ttl = ttl
+
+    @staticmethod
+    def _key(trace_id: str) -> str:
+        return f"result:{trace_id}"
+
+    async def set(self, trace_id: str, result: Dict[str, Any]) -> None:
+        # Serialize numpy values like a2a.json_dumps, so this store accepts
+        # the same payloads as the in-memory one.
+        await self._redis.set(self._key(trace_id), orjson.dumps(result, option=orjson.OPT_SERIALIZE_NUMPY), ex=self._ttl)
+
+    async def get(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        raw = await self._redis.get(self._key(trace_id))
+        return orjson.loads(raw) if raw else None
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+def create_result_store():
+    url = os.getenv("REDIS_URL")
+    if url:
+        logger.info("Using Redis result store")
+        return RedisResultStore(url)
+    logger.warning("REDIS_URL not set. Using in-process result store (single worker only).")
+    return MemoryResultStore()
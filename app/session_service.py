@@ -1,62 +1,66 @@
 import time
 import uuid
-from typing import Any, Dict, Optional
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
 
 from loguru import logger
 
 
+@dataclass(slots=True)
+class Session:
+    user_id: str
+    state: Dict[str, Any] = field(default_factory=dict)
+    checkpoints: List[Dict[str, Any]] = field(default_factory=list)
+    paused: bool = False
+    created_ts: int = 0
+
+
 class InMemorySessionService:
     def __init__(self):
-        self._sessions: Dict[str, Dict[str, Any]] = {}
+        self._sessions: Dict[str, Session] = {}
+        # user_id -> session ids, so delete_user touches only that user's sessions.
+        self._by_user: Dict[str, Set[str]] = {}
+        # Bound once; per-call values go in as positional format args, which
+        # loguru only formats if the record is actually emitted.
+        self._log = logger.bind(component="session")
 
     def create_session(self, user_id: str) -> str:
         sid = str(uuid.uuid4())
-        self._sessions[sid] = {
-            "user_id": user_id,
-            "state": {},
-            "checkpoints": [],
-            "paused": False,
-            "created_ts": int(time.time()),
-        }
-        logger.info("session_created", extra={"session_id": sid, "user_id": user_id})
+        self._sessions[sid] = Session(user_id=user_id, created_ts=int(time.time()))
+        self._by_user.setdefault(user_id, set()).add(sid)
+        self._log.info("session_created session_id={} user_id={}", sid, user_id)
         return sid
 
-    def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+    def get_session(self, session_id: str) -> Optional[Session]:
         return self._sessions.get(session_id)
 
-    def update_session(self, session_id: str, state_dict: Dict[str, Any]) -> None:
+    def _require(self, session_id: str) -> Session:
         s = self._sessions.get(session_id)
-        if not s:
+        if s is None:
             raise KeyError("Session not found")
-        s["state"].update(state_dict)
-        logger.info("session_updated", extra={"session_id": session_id})
+        return s
+
+    def update_session(self, session_id: str, state_dict: Dict[str, Any]) -> None:
+        self._require(session_id).state.update(state_dict)
+        self._log.info("session_updated session_id={}", session_id)
 
     def add_checkpoint(self, session_id: str, checkpoint: Dict[str, Any]) -> None:
-        s = self._sessions.get(session_id)
-        if not s:
-            raise KeyError("Session not found")
-        s["checkpoints"].append({**checkpoint, "ts": int(time.time())})
-        logger.info("checkpoint_added", extra={"session_id": session_id})
+        self._require(session_id).checkpoints.append({**checkpoint, "ts": int(time.time())})
+        self._log.info("checkpoint_added session_id={}", session_id)
 
     def pause_session(self, session_id: str) -> None:
-        s = self._sessions.get(session_id)
-        if not s:
-            raise KeyError("Session not found")
-        s["paused"] = True
-        logger.info("session_paused", extra={"session_id": session_id})
+        self._require(session_id).paused = True
+        self._log.info("session_paused session_id={}", session_id)
 
     def resume_session(self, session_id: str) -> None:
-        s = self._sessions.get(session_id)
-        if not s:
-            raise KeyError("Session not found")
-        s["paused"] = False
-        logger.info("session_resumed", extra={"session_id": session_id})
+        self._require(session_id).paused = False
+        self._log.info("session_resumed session_id={}", session_id)
 
     def delete_user(self, user_id: str) -> int:
-        to_delete = [sid for sid, s in self._sessions.items() if s.get("user_id") == user_id]
+        to_delete = self._by_user.pop(user_id, set())
         for sid in to_delete:
-            del self._sessions[sid]
-        logger.info("session_user_deleted", extra={"user_id": user_id, "count": len(to_delete)})
+            self._sessions.pop(sid, None)
+        self._log.info("session_user_deleted user_id={} count={}", user_id, len(to_delete))
         return len(to_delete)
 
 
@@ -68,7 +72,7 @@ class SessionServiceDB:
     def create_session(self, user_id: str) -> str:
         raise NotImplementedError("DB-backed session service not implemented yet")
 
-    def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+    def get_session(self, session_id: str) -> Optional[Session]:
         raise NotImplementedError
 
     def update_session(self, session_id: str, state_dict: Dict[str, Any]) -> None:
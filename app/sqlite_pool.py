@@ -0,0 +1,186 @@
+"""
+Shared SQLite connections for the small file-backed stores (eval, a2a, ...).
+
+Opening a connection per call pays a file open plus the default
+fsync-heavy durability on every write. Instead each database file gets one
+long-lived handle, tuned once with WAL pragmas and shared across callers.
+Because the handle lives for the whole process, sqlite3's per-connection
+statement cache (keyed by SQL text) keeps hot statements prepared.
+
+Functions:
+- get_connection(path, schema=None) -> cached sqlite3.Connection
+- transaction(path, schema=None) -> context manager wrapping BEGIN IMMEDIATE/COMMIT
+- get_read_connection(path, schema=None) -> per-thread handle for reads, so
+  a reader never runs inside another thread's open transaction and WAL
+  readers don't queue on the shared handle
+- get_async_connection / async_transaction -> the same for aiosqlite,
+  for use inside async request handlers
+- close_all() / close_all_async()
+"""
+
+import asyncio
+import atexit
+import sqlite3
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+
+import aiosqlite
+from loguru import logger
+
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL;"
+    "PRAGMA synchronous=NORMAL;"
+    "PRAGMA temp_store=MEMORY;"
+    "PRAGMA cache_size=-64000;"
+    "PRAGMA mmap_size=268435456;"
+    "PRAGMA busy_timeout=5000;"
+)
+
+# Prepared statements kept per connection (sqlite3's default is 128).
+STATEMENT_CACHE_SIZE = 256
+
+_lock = threading.Lock()
+_conns: Dict[str, sqlite3.Connection] = {}
+_write_locks: Dict[str, threading.Lock] = {}
+
+# Per-thread read handles. `_generation` bumps on close_all() so threads
+# drop handles that were closed under them.
+_local = threading.local()
+_read_conns: List[sqlite3.Connection] = []
+_generation = 0
+
+_async_conns: Dict[str, aiosqlite.Connection] = {}
+_async_write_locks: Dict[str, asyncio.Lock] = {}
+
+
+def get_connection(path: str, schema: Optional[str] = None) -> sqlite3.Connection:
+    """
+    Return the shared connection for `path`, opening it on first use.
+
+    `schema` (a DDL script) runs once, right after the connection is opened.
+    The handle is in autocommit mode; group writes with `transaction()`.
+    """
+    conn = _conns.get(path)
+    if conn is not None:
+        return conn
+    with _lock:
+        conn = _conns.get(path)
+        if conn is None:
+            conn = sqlite3.connect(
+                path,
+                check_same_thread=False,
+                isolation_level=None,
+                cached_statements=STATEMENT_CACHE_SIZE,
+            )
+            conn.executescript(PRAGMAS)
+            if schema:
+                conn.executescript(schema)
+            _write_locks[path] = threading.Lock()
+            _conns[path] = conn
+            logger.info("sqlite_connection_opened", extra={"db_path": path})
+    return conn
+
+
+def get_read_connection(path: str, schema: Optional[str] = None) -> sqlite3.Connection:
+    """
+    Return this thread's read connection for `path`, opening it on first use.
+
+    Reads on the shared handle would see rows from a `transaction()` another
+    thread has open but not committed; a separate connection only sees
+    committed data. Writes still go through `transaction()`.
+    """
+    conns = getattr(_local, "conns", None)
+    if conns is None or _local.generation != _generation:
+        conns = _local.conns = {}
+        _local.generation = _generation
+    conn = conns.get(path)
+    if conn is None:
+        # The shared handle creates the file and runs the schema once.
+        get_connection(path, schema)
+        conn = sqlite3.connect(
+            path,
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        conn.executescript(PRAGMAS)
+        conns[path] = conn
+        with _lock:
+            _read_conns.append(conn)
+    return conn
+
+
+@contextmanager
+def transaction(path: str, schema: Optional[str] = None) -> Iterator[sqlite3.Connection]:
+    """
+    Run the enclosed statements as a single transaction on the shared handle.
+
+    BEGIN IMMEDIATE takes the write lock up front, so a writer in another
+    process waits on busy_timeout instead of failing with "database is
+    locked" when a deferred transaction tries to upgrade.
+    """
+    conn = get_connection(path, schema)
+    with _write_locks[path]:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+async def get_async_connection(path: str, schema: Optional[str] = None) -> aiosqlite.Connection:
+    """aiosqlite counterpart of `get_connection`: one tuned handle per file."""
+    conn = _async_conns.get(path)
+    if conn is not None:
+        return conn
+    conn = await aiosqlite.connect(path, isolation_level=None)
+    await conn.executescript(PRAGMAS)
+    if schema:
+        await conn.executescript(schema)
+    existing = _async_conns.setdefault(path, conn)
+    if existing is not conn:
+        # Another coroutine opened the same file while we were awaiting.
+        await conn.close()
+        return existing
+    _async_write_locks[path] = asyncio.Lock()
+    logger.info("sqlite_async_connection_opened", extra={"db_path": path})
+    return conn
+
+
+@asynccontextmanager
+async def async_transaction(path: str, schema: Optional[str] = None) -> AsyncIterator[aiosqlite.Connection]:
+    conn = await get_async_connection(path, schema)
+    async with _async_write_locks[path]:
+        await conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            await conn.execute("ROLLBACK")
+            raise
+        await conn.execute("COMMIT")
+
+
+def close_all() -> None:
+    global _generation
+    with _lock:
+        for conn in (*_conns.values(), *_read_conns):
+            conn.close()
+        _conns.clear()
+        _write_locks.clear()
+        _read_conns.clear()
+        _generation += 1
+
+
+atexit.register(close_all)
+
+
+async def close_all_async() -> None:
+    conns = list(_async_conns.values())
+    _async_conns.clear()
+    _async_write_locks.clear()
+    for conn in conns:
+        await conn.close()
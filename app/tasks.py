@@ -8,7 +8,7 @@ Ensure REDIS_URL is set in environment and this package is importable.
 """
 
 import os
-import time
+from datetime import timedelta
 from typing import Any, Dict
 
 from loguru import logger
@@ -18,9 +18,14 @@ from rq import Queue
 from .session_service import InMemorySessionService
 
 
-import uuid
+import itertools
+import secrets
 from dataclasses import dataclass
 
+# SyncQueue job ids only need to be unique within this process.
+_proc_tag = secrets.token_hex(4)
+_job_counter = itertools.count()
+
 # Mock Job for SyncQueue
 @dataclass
 class MockJob:
@@ -30,10 +35,15 @@ class SyncQueue:
     def __init__(self, *args, **kwargs):
         pass
 
-    def enqueue(self, func, *args, **kwargs):
-        # Run synchronously
-        func(*args, **kwargs)
-        return MockJob(str(uuid.uuid4()))
+    def enqueue(self, func, *args, defer: bool = False, **kwargs):
+        # Run synchronously, unless the caller only wants a job handle.
+        if not defer:
+            func(*args, **kwargs)
+        return MockJob(f"{_proc_tag}-{next(_job_counter)}")
+
+    def enqueue_in(self, delay: timedelta, func, *args, **kwargs):
+        # Mirrors rq's Queue.enqueue_in; there is no scheduler here, so run now.
+        return self.enqueue(func, *args, **kwargs)
 
 # Use SyncQueue instead of Redis/RQ
 # REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
@@ -43,34 +53,48 @@ queue = SyncQueue()
 
 
 _session_service = InMemorySessionService()
+_log = logger.bind(component="journey")
+
+STAGES = (
+    "grounding",
+    "awareness",
+    "reflection",
+    "reframing",
+    "planning",
+    "action",
+    "integration",
+)
+# Pacing between stages on a real RQ queue. Each stage is its own job, so no
+# worker sits in sleep() while a journey waits.
+STAGE_DELAY = timedelta(seconds=0.5)
+PAUSED_DELAY = timedelta(seconds=1.0)
+
+
+def _advance_stage(session_id: str, i: int) -> None:
+    svc = _session_service
+    name = STAGES[i]
+    s = svc.get_session(session_id)
+    if not s:
+        _log.warning("session_missing session_id={}", session_id)
+        return
+    if s.paused:
+        _log.info("journey_paused session_id={} stage={}", session_id, name)
+        delay = PAUSED_DELAY
+    else:
+        svc.update_session(session_id, {"stage": name, "index": i + 1})
+        svc.add_checkpoint(session_id, {"stage": name, "status": "completed"})
+        delay = STAGE_DELAY
+    if i + 1 < len(STAGES):
+        queue.enqueue_in(delay, _advance_stage, session_id, i + 1)
+    else:
+        _log.info("journey_done session_id={}", session_id)
 
 
 def long_healing_journey(session_id: str) -> Dict[str, Any]:
-    stages = [
-        "grounding",
-        "awareness",
-        "reflection",
-        "reframing",
-        "planning",
-        "action",
-        "integration",
-    ]
-    logger.info("journey_start", extra={"session_id": session_id})
-    for i, name in enumerate(stages, 1):
-        s = _session_service.get_session(session_id)
-        if not s:
-            logger.warning("session_missing", extra={"session_id": session_id})
-            break
-        if s.get("paused"):
-            logger.info("journey_paused", extra={"session_id": session_id, "stage": name})
-            time.sleep(1.0)
-            continue
-        _session_service.update_session(session_id, {"stage": name, "index": i})
-        _session_service.add_checkpoint(session_id, {"stage": name, "status": "completed"})
-        time.sleep(0.5)
-    logger.info("journey_done", extra={"session_id": session_id})
+    _log.info("journey_start session_id={}", session_id)
+    _advance_stage(session_id, 0)
     return {"status": "ok", "session_id": session_id}
 
 
 def enqueue_long_healing_journey(session_id: str):
-    return queue.enqueue(long_healing_journey, session_id)
\ No newline at end of file
+    return queue.enqueue(long_healing_journey, session_id)
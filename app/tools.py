@@ -8,33 +8,53 @@ Exposed tools:
 sentiment_tool is LLM-based and expects OPENAI_API_KEY available.
 """
 
+import hashlib
 import json
 import uuid
-from typing import Any, Dict
+from typing import Any, Dict, Tuple
 
+import orjson
+from cachetools import LRUCache
 from loguru import logger
 
 from .llm import call_llm
 from .observability import AGENT_CALLS_TOTAL, AgentTimer
 
 
+_JSON_DECODER = json.JSONDecoder()
+
+
 def _parse_json(text: str) -> Dict[str, Any]:
     try:
-        return json.loads(text)
-    except Exception:
+        return orjson.loads(text)
+    except orjson.JSONDecodeError:
+        # Decode one object starting at the first brace: a single pass that
+        # ignores any prose or code fences around it.
         start = text.find("{")
-        end = text.rfind("}")
-        if start != -1 and end != -1 and end > start:
-            candidate = text[start : end + 1]
-            return json.loads(candidate)
+        if start != -1:
+            try:
+                return _JSON_DECODER.raw_decode(text, start)[0]
+            except json.JSONDecodeError:
+                pass
         raise RuntimeError("Failed to parse JSON from tool output")
 
 
+# blake2b-128(text) -> (emotion, score). The LLM runs at temperature 0, so a
+# repeated text gets the same answer; skip the round trip.
+_SENTIMENT_CACHE: "LRUCache[bytes, Tuple[str, float]]" = LRUCache(maxsize=4096)
+
+
 def sentiment_tool(text: str) -> Dict[str, Any]:
     """
     Analyze sentiment/emotion via LLM and return a JSON dict:
     {"emotion": <string>, "score": <float 0.0-1.0>}.
     """
+    key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+    cached = _SENTIMENT_CACHE.get(key)
+    if cached is not None:
+        AGENT_CALLS_TOTAL.labels(agent="sentiment_tool_cache_hit").inc()
+        return {"emotion": cached[0], "score": cached[1]}
+
     prompt = (
         "You are a sentiment analysis tool. Given the user's text, return ONLY JSON with "
         "fields: {\"emotion\": string (primary emotion label), \"score\": number (0.0-1.0 confidence)}.\n"
@@ -48,7 +68,9 @@ def sentiment_tool(text: str) -> Dict[str, Any]:
     data = _parse_json(output)
     if "emotion" not in data or "score" not in data:
         raise RuntimeError("sentiment_tool missing required fields")
-    return {"emotion": str(data["emotion"]), "score": float(data["score"])}
+    emotion, score = str(data["emotion"]), float(data["score"])
+    _SENTIMENT_CACHE[key] = (emotion, score)
+    return {"emotion": emotion, "score": score}
 
 
 def tts_tool(text: str) -> str:
@@ -56,7 +78,7 @@ def tts_tool(text: str) -> str:
     Placeholder text-to-speech tool.
     Returns a dummy URL or file path for the synthesized audio.
     """
-    audio_id = str(uuid.uuid4())
+    audio_id = uuid.uuid4().hex
     url = f"https://example.local/tts/{audio_id}.mp3"
     logger.info("tts_tool_call", extra={"text_len": len(text), "url": url})
     AGENT_CALLS_TOTAL.labels(agent="tts_tool").inc()
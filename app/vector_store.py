@@ -1,8 +1,12 @@
+import atexit
+import functools
 import os
+import threading
 import uuid
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 
+import orjson
 from dotenv import load_dotenv
 from loguru import logger
 from qdrant_client import QdrantClient
@@ -12,104 +16,287 @@ load_dotenv()
 
 QDRANT_URL = os.getenv("QDRANT_URL")
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
+# gRPC sends vectors as packed protobuf floats rather than JSON text and
+# multiplexes requests over one HTTP/2 channel. Set QDRANT_PREFER_GRPC=0
+# where port 6334 is not reachable.
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "1").lower() not in ("0", "false", "no")
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+QDRANT_TIMEOUT = int(os.getenv("QDRANT_TIMEOUT", "10"))
 COLLECTION_NAME = "user_memories"
+# Semantic cache of agent outputs, keyed by the embedding of the user's input.
+RESPONSE_CACHE_COLLECTION = "agent_response_cache"
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.97"))
+
+# int8 scalar quantization: HNSW candidate scoring runs on 1-byte codes kept
+# in RAM, then the top oversampled hits are rescored against the original
+# float vectors so ranking quality holds.
+QUANTIZATION_CONFIG = models.ScalarQuantization(
+    scalar=models.ScalarQuantizationConfig(
+        type=models.ScalarType.INT8,
+        quantile=0.99,
+        always_ram=True,
+    )
+)
+SEARCH_PARAMS = models.SearchParams(
+    # Memory lookups ask for a handful of hits; recall plateaus well below
+    # the default ef of 128 at that k.
+    hnsw_ef=64,
+    quantization=models.QuantizationSearchParams(rescore=True, oversampling=2.0),
+)
+# Only these payload fields are shipped back with each hit.
+RESULT_PAYLOAD = models.PayloadSelectorInclude(include=["text", "timestamp"])
+
+# add_memory buffers points and upserts them together once this many are
+# pending, or after FLUSH_INTERVAL_SEC, whichever comes first.
+UPSERT_BATCH_SIZE = 64
+FLUSH_INTERVAL_SEC = 0.2
 
 class VectorStore:
+    """
+    Qdrant-backed memory store. Construction does no I/O: the client is
+    created and the collections checked on first use (see `_ready`).
+    """
+
     def __init__(self):
-        self.client = None
-        self.enabled = False
-        
-        if QDRANT_URL and QDRANT_API_KEY:
-            try:
-                self.client = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
-                self.enabled = True
-                logger.info("Connected to Qdrant Cloud")
-                self._ensure_collection()
-            except Exception as e:
-                logger.error(f"Failed to connect to Qdrant: {e}")
-                self.enabled = False
-        else:
+        self.client: Optional[QdrantClient] = None
+        self.enabled = bool(QDRANT_URL and QDRANT_API_KEY)
+        self._buffer: List[models.PointStruct] = []
+        self._buffer_lock = threading.Lock()
+        self._flush_timer: Optional[threading.Timer] = None
+        self._bootstrapped = False
+        self._bootstrap_lock = threading.Lock()
+
+        if not self.enabled:
             logger.warning("QDRANT_URL or QDRANT_API_KEY not set. Memory features disabled.")
 
+    def _ready(self) -> bool:
+        """Bootstrap once (double-checked under a lock); True if Qdrant is usable."""
+        if not self._bootstrapped:
+            with self._bootstrap_lock:
+                if not self._bootstrapped:
+                    self._bootstrap()
+                    self._bootstrapped = True
+        return self.enabled and self.client is not None
+
+    def _bootstrap(self) -> None:
+        if not self.enabled:
+            return
+        try:
+            if self.client is None:
+                self.client = QdrantClient(
+                    url=QDRANT_URL,
+                    api_key=QDRANT_API_KEY,
+                    prefer_grpc=QDRANT_PREFER_GRPC,
+                    grpc_port=QDRANT_GRPC_PORT,
+                    timeout=QDRANT_TIMEOUT,
+                )
+                logger.info("Connected to Qdrant Cloud")
+            self._ensure_collection()
+        except Exception as e:
+            logger.error(f"Failed to connect to Qdrant: {e}")
+            self.enabled = False
+
     def _ensure_collection(self):
-        """Ensure the collection exists with correct config."""
+        """Ensure the collections exist with correct config."""
         if not self.enabled or not self.client:
             return
 
         try:
             collections = self.client.get_collections()
-            exists = any(c.name == COLLECTION_NAME for c in collections.collections)
-            
-            if not exists:
-                logger.info(f"Creating Qdrant collection: {COLLECTION_NAME}")
-                self.client.create_collection(
-                    collection_name=COLLECTION_NAME,
-                    vectors_config=models.VectorParams(size=1536, distance=models.Distance.COSINE),
-                )
+            existing = {c.name for c in collections.collections}
+            # Keyword indexes so filters are posting-list lookups rather than
+            # payload scans; creating one again is a no-op.
+            for name, keyword_fields in (
+                (COLLECTION_NAME, ("user_id",)),
+                (RESPONSE_CACHE_COLLECTION, ("user_id", "agent")),
+            ):
+                self._ensure_one_collection(name, name in existing)
+                for field_name in keyword_fields:
+                    self.client.create_payload_index(
+                        collection_name=name,
+                        field_name=field_name,
+                        field_schema=models.PayloadSchemaType.KEYWORD,
+                    )
         except Exception as e:
             logger.error(f"Error checking/creating collection: {e}")
 
-    def add_memory(self, user_id: str, text: str, embedding: List[float], metadata: Dict[str, Any]) -> bool:
-        """Add a memory vector for a user."""
-        if not self.enabled or not self.client:
-            return False
+    def _ensure_one_collection(self, name: str, exists: bool) -> None:
+        if not exists:
+            logger.info(f"Creating Qdrant collection: {name}")
+            self.client.create_collection(
+                collection_name=name,
+                # Originals in float16 (half the disk/IO of float32); they are only
+                # read to rescore the int8 candidates.
+                vectors_config=models.VectorParams(
+                    size=1536,
+                    distance=models.Distance.COSINE,
+                    on_disk=True,
+                    datatype=models.Datatype.FLOAT16,
+                ),
+                quantization_config=QUANTIZATION_CONFIG,
+            )
+        elif self.client.get_collection(name).config.quantization_config is None:
+            # Collections created before quantization: build the int8 codes in place.
+            logger.info(f"Enabling int8 quantization on Qdrant collection: {name}")
+            self.client.update_collection(
+                collection_name=name,
+                quantization_config=QUANTIZATION_CONFIG,
+            )
 
-        try:
-            point_id = str(uuid.uuid4())
-            payload = {
+    @staticmethod
+    def _point(user_id: str, text: str, embedding: List[float], metadata: Dict[str, Any]) -> models.PointStruct:
+        return models.PointStruct(
+            id=uuid.uuid4().hex,
+            vector=embedding,
+            payload={
                 "user_id": user_id,
                 "text": text,
                 "timestamp": datetime.now().isoformat(),
                 **metadata
-            }
-            
-            self.client.upsert(
-                collection_name=COLLECTION_NAME,
-                points=[
-                    models.PointStruct(
-                        id=point_id,
-                        vector=embedding,
-                        payload=payload
-                    )
-                ]
-            )
-            logger.info(f"Memory stored in Qdrant for user {user_id}")
+            },
+        )
+
+    def add_memory(self, user_id: str, text: str, embedding: List[float], metadata: Dict[str, Any]) -> bool:
+        """Queue a memory vector for a user; it is upserted with the next batch."""
+        if not self._ready():
+            return False
+
+        point = self._point(user_id, text, embedding, metadata)
+        with self._buffer_lock:
+            self._buffer.append(point)
+            full = len(self._buffer) >= UPSERT_BATCH_SIZE
+            if not full and self._flush_timer is None:
+                self._flush_timer = threading.Timer(FLUSH_INTERVAL_SEC, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+        if full:
+            self.flush()
+        return True
+
+    def add_memory_many(self, items: List[Tuple[str, str, List[float], Dict[str, Any]]]) -> bool:
+        """Upsert several (user_id, text, embedding, metadata) memories in one request."""
+        if not self._ready():
+            return False
+        return self._upsert([self._point(*item) for item in items])
+
+    def flush(self) -> bool:
+        """Upsert any buffered memories now."""
+        with self._buffer_lock:
+            points, self._buffer = self._buffer, []
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+        return self._upsert(points) if points else True
+
+    def _upsert(self, points: List[models.PointStruct], collection_name: str = COLLECTION_NAME) -> bool:
+        try:
+            self.client.upsert(collection_name=collection_name, points=points)
+            logger.info(f"Stored {len(points)} points in Qdrant collection {collection_name}")
             return True
         except Exception as e:
-            logger.error(f"Failed to add memory to Qdrant: {e}")
+            logger.error(f"Failed to add {len(points)} points to Qdrant collection {collection_name}: {e}")
             return False
 
     def search_memories(self, user_id: str, embedding: List[float], limit: int = 5) -> List[Dict[str, Any]]:
         """Search for similar memories for a specific user."""
-        if not self.enabled or not self.client:
-            return []
+        return self.search_memories_batch(user_id, [embedding], limit)[0]
+
+    def search_memories_batch(self, user_id: str, embeddings: List[List[float]], limit: int = 5) -> List[List[Dict[str, Any]]]:
+        """Search several query vectors for one user in a single round trip; one result list per query."""
+        empty: List[List[Dict[str, Any]]] = [[] for _ in embeddings]
+        if not embeddings or not self._ready():
+            return empty
 
+        user_filter = models.Filter(
+            must=[
+                models.FieldCondition(
+                    key="user_id",
+                    match=models.MatchValue(value=user_id)
+                )
+            ]
+        )
         try:
-            hits = self.client.search(
+            responses = self.client.query_batch_points(
                 collection_name=COLLECTION_NAME,
-                query_vector=embedding,
-                query_filter=models.Filter(
-                    must=[
-                        models.FieldCondition(
-                            key="user_id",
-                            match=models.MatchValue(value=user_id)
-                        )
-                    ]
-                ),
-                limit=limit
+                requests=[
+                    models.QueryRequest(query=embedding, filter=user_filter, limit=limit, params=SEARCH_PARAMS, with_payload=RESULT_PAYLOAD)
+                    for embedding in embeddings
+                ],
             )
-            
-            results = []
-            for hit in hits:
-                results.append({
-                    "text": hit.payload.get("text", ""),
-                    "metadata": hit.payload,
-                    "score": hit.score
-                })
-            return results
+            return [
+                [
+                    {
+                        "text": hit.payload.get("text", ""),
+                        "metadata": hit.payload,
+                        "score": hit.score
+                    }
+                    for hit in response.points
+                ]
+                for response in responses
+            ]
         except Exception as e:
             logger.error(f"Search failed in Qdrant: {e}")
-            return []
+            return empty
+
+    def lookup_responses(self, user_id: str, agents: List[str], embedding: List[float]) -> Dict[str, Dict[str, Any]]:
+        """
+        Cached outputs for `agents` whose stored input is at least
+        RESPONSE_CACHE_THRESHOLD cosine-similar to `embedding`, scoped to the
+        user. One round trip for all agents; agents without a hit are absent.
+        """
+        if not agents or not self._ready():
+            return {}
+        try:
+            responses = self.client.query_batch_points(
+                collection_name=RESPONSE_CACHE_COLLECTION,
+                requests=[
+                    models.QueryRequest(
+                        query=embedding,
+                        filter=models.Filter(
+                            must=[
+                                models.FieldCondition(key="user_id", match=models.MatchValue(value=user_id)),
+                                models.FieldCondition(key="agent", match=models.MatchValue(value=agent)),
+                            ]
+                        ),
+                        limit=1,
+                        score_threshold=RESPONSE_CACHE_THRESHOLD,
+                        params=SEARCH_PARAMS,
+                        with_payload=models.PayloadSelectorInclude(include=["output"]),
+                    )
+                    for agent in agents
+                ],
+            )
+            return {
+                agent: orjson.loads(response.points[0].payload["output"])
+                for agent, response in zip(agents, responses)
+                if response.points
+            }
+        except Exception as e:
+            logger.error(f"Response cache lookup failed in Qdrant: {e}")
+            return {}
+
+    def store_responses(self, user_id: str, embedding: List[float], outputs: Dict[str, Dict[str, Any]]) -> bool:
+        """Cache each agent's output under the input embedding, in one upsert."""
+        if not outputs or not self._ready():
+            return False
+        points = [
+            models.PointStruct(
+                id=uuid.uuid4().hex,
+                vector=embedding,
+                payload={
+                    "user_id": user_id,
+                    "agent": agent,
+                    "output": orjson.dumps(output).decode(),
+                    "timestamp": datetime.now().isoformat(),
+                },
+            )
+            for agent, output in outputs.items()
+        ]
+        return self._upsert(points, RESPONSE_CACHE_COLLECTION)
 
-# Singleton instance
-vector_store = VectorStore()
+@functools.lru_cache(maxsize=1)
+def get_vector_store() -> VectorStore:
+    """Process-wide store, created on first call (importing this module does no I/O)."""
+    store = VectorStore()
+    atexit.register(store.flush)
+    return store
@@ -0,0 +1,51 @@
+"""
+Compact embedding representations and vectorized similarity.
+
+Embeddings come back from the API as Python float lists (~28 B per value).
+For caching and local comparison they are kept as numpy arrays instead:
+float32 (4 B/dim) or symmetric int8 with one float scale per vector
+(1 B/dim, ~4x smaller again), which is plenty for cosine ranking.
+
+Functions:
+- to_float32(vec) -> np.ndarray
+- quantize_int8(vec) -> (int8 array, scale)
+- dequantize_int8(q, scale) -> float32 array
+- int8_scores(query_q, query_scale, keys_q, keys_scale) -> dot-product scores
+"""
+
+from typing import Sequence, Tuple, Union
+
+import numpy as np
+
+
+VectorLike = Union[Sequence[float], np.ndarray]
+
+
+def to_float32(vec: VectorLike) -> np.ndarray:
+    return np.asarray(vec, dtype=np.float32)
+
+
+def quantize_int8(vec: VectorLike) -> Tuple[np.ndarray, float]:
+    """Symmetric per-vector quantization: v ~= q * scale with q in [-127, 127]."""
+    v = to_float32(vec)
+    peak = float(np.max(np.abs(v))) if v.size else 0.0
+    if peak == 0.0:
+        return np.zeros(v.shape, dtype=np.int8), 1.0
+    scale = peak / 127.0
+    q = np.round(v / scale).astype(np.int8)
+    return q, scale
+
+
+def dequantize_int8(q: np.ndarray, scale: float) -> np.ndarray:
+    return q.astype(np.float32) * np.float32(scale)
+
+
+def int8_scores(query_q: np.ndarray, query_scale: float, keys_q: np.ndarray, keys_scale: np.ndarray) -> np.ndarray:
+    """
+    Approximate dot products of one quantized query against N quantized keys.
+
+    `keys_q` is (N, dim) int8 and `keys_scale` is (N,). The products are
+    accumulated in int32 (no overflow for dim < 2**17) and rescaled once.
+    """
+    raw = keys_q.astype(np.int32) @ query_q.astype(np.int32)
+    return raw.astype(np.float32) * (np.float32(query_scale) * np.asarray(keys_scale, dtype=np.float32))
@@ -1,23 +1,78 @@
-import json
 import sys
 import time
 
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
 
 
 BASE = "http://127.0.0.1:8000"
 
+# One keep-alive connection for the whole run, including the result polling.
+_http = requests.Session()
+_http.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=0))
+_http.headers["Content-Type"] = "application/json"
+
+
+def _show(obj) -> None:
+    print(orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode())
+
 
 def post(path: str, payload: dict):
-    r = requests.post(BASE + path, json=payload, timeout=10)
+    r = _http.post(BASE + path, data=orjson.dumps(payload), timeout=10)
     r.raise_for_status()
-    return r.json()
+    return orjson.loads(r.content)
 
 
 def get(path: str):
-    r = requests.get(BASE + path, timeout=10)
+    r = _http.get(BASE + path, timeout=10)
     r.raise_for_status()
-    return r.json()
+    return orjson.loads(r.content)
+
+
+def stream_result(trace_id: str):
+    """
+    One SSE request that the server holds open until the result is ready.
+    Returns None if the server has no stream endpoint, {} on timeout.
+    """
+    with _http.get(f"{BASE}/result/{trace_id}/stream", stream=True, timeout=65) as r:
+        if r.status_code == 404:
+            return None
+        r.raise_for_status()
+        event = None
+        for line in r.iter_lines():
+            if line.startswith(b"event: "):
+                event = line[len(b"event: "):]
+            elif line.startswith(b"data: ") and event == b"done":
+                res = orjson.loads(line[len(b"data: "):])
+                return res if ("past" in res or "error" in res) else {}
+    return {}
+
+
+def poll_result(trace_id: str):
+    deadline = time.time() + 60
+    # Agents run concurrently, so results can land well under a second;
+    # poll quickly at first and back off to 1s.
+    interval = 0.25
+    while time.time() < deadline:
+        try:
+            res = get(f"/result/{trace_id}")
+            if res and ("past" in res or "error" in res):
+                return res
+        except Exception:
+            pass
+        time.sleep(interval)
+        interval = min(interval * 2, 1.0)
+    return None
+
+
+def wait_for_result(trace_id: str):
+    try:
+        res = stream_result(trace_id)
+        return poll_result(trace_id) if res is None else res
+    except requests.RequestException:
+        # Older server without the stream endpoint, or the stream dropped.
+        return poll_result(trace_id)
 
 
 def main():
@@ -32,17 +87,7 @@ def main():
     print(f"[smoke] trace_id: {trace_id}")
 
     print("[smoke] waiting for orchestrator result")
-    deadline = time.time() + 60
-    result = None
-    while time.time() < deadline:
-        try:
-            res = get(f"/result/{trace_id}")
-            if res and ("past" in res or "error" in res):
-                result = res
-                break
-        except Exception:
-            pass
-        time.sleep(1.0)
+    result = wait_for_result(trace_id)
 
     if not result:
         print("[smoke] no result within timeout", file=sys.stderr)
@@ -52,13 +97,13 @@ def main():
         print(f"[smoke] orchestrator error: {result['error']}")
     else:
         print("[smoke] Past:")
-        print(json.dumps(result.get("past", {}), indent=2))
+        _show(result.get("past", {}))
         print("[smoke] Present:")
-        print(json.dumps(result.get("present", {}), indent=2))
+        _show(result.get("present", {}))
         print("[smoke] Future:")
-        print(json.dumps(result.get("future", {}), indent=2))
+        _show(result.get("future", {}))
         print("[smoke] Integration:")
-        print(json.dumps(result.get("integration", {}), indent=2))
+        _show(result.get("integration", {}))
 
     print("[smoke] sending rating 4")
     _ = post("/eval", {"trace_id": trace_id, "user_id": "user1", "rating": 4, "comments": "smoke"})
@@ -0,0 +1,40 @@
+import unittest
+
+from app.audio import StreamingTranscriber
+
+
+class _GrowingTranscriber:
+    """Each call hears one more word of the same sentence."""
+
+    enabled = True
+
+    def __init__(self):
+        self.calls = 0
+
+    def transcribe_words(self, audio_file, filename, prompt=""):
+        self.calls += 1
+        words = "hello there my good friend".split()[: self.calls + 1]
+        return [{"word": w, "start": i * 0.5, "end": i * 0.5 + 0.4} for i, w in enumerate(words)]
+
+
+class TestStreamingTranscriber(unittest.TestCase):
+    def test_local_agreement_confirms_stable_prefix(self):
+        st = StreamingTranscriber(_GrowingTranscriber())
+        one_second = b"\0" * 32000
+
+        st.insert_audio(one_second)
+        self.assertTrue(st.ready())
+        # First hypothesis has nothing to agree with yet.
+        self.assertEqual(st.process(), "")
+
+        st.insert_audio(one_second)
+        self.assertEqual(st.process(), "hello there")
+
+        st.insert_audio(one_second)
+        self.assertEqual(st.process(), "my")
+        self.assertEqual(st.finish(), "good friend")
+        self.assertEqual(st.text, "hello there my good friend")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+
+class TestEmbeddingCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = mock.patch.dict(os.environ, {"EMBEDDING_CACHE_DB": os.path.join(self.tmp.name, "emb.db")})
+        self.env.start()
+
+    def tearDown(self):
+        from app.sqlite_pool import close_all
+
+        close_all()
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def test_repeated_text_hits_cache(self):
+        from app import embedding_cache, llm
+
+        client = mock.Mock()
+        client.embeddings.create.return_value = mock.Mock(data=[mock.Mock(embedding=[0.5, -1.0, 2.0])])
+        embedding_cache._MEM_LRU.clear()
+        with mock.patch.object(llm, "_get_client", return_value=client):
+            first = embedding_cache.get_or_compute("same text")
+            embedding_cache._MEM_LRU.clear()  # force the SQLite tier
+            second = embedding_cache.get_or_compute("same text")
+            third = embedding_cache.get_or_compute("same text")
+
+        for got, want in zip(first, [0.5, -1.0, 2.0]):
+            self.assertAlmostEqual(got, want, delta=0.01)
+        self.assertEqual(second, first)
+        self.assertEqual(third, first)
+        client.embeddings.create.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+
+class TestEvalStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.old_env = {k: os.environ.get(k) for k in ("EVAL_DB", "A2A_DB")}
+        os.environ["EVAL_DB"] = os.path.join(self.tmp.name, "eval.db")
+        os.environ["A2A_DB"] = os.path.join(self.tmp.name, "a2a.db")
+
+    def tearDown(self):
+        from app.sqlite_pool import close_all, close_all_async
+
+        close_all()
+        asyncio.run(close_all_async())
+        for k, v in self.old_env.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+        self.tmp.cleanup()
+
+    def test_submit_and_summary(self):
+        from app import eval as ev
+
+        async def run():
+            self.assertGreater(await ev.submit_evaluation("t1", "u1", 4, "good"), 0)
+            await ev.submit_evaluation("t2", "u1", 2, None)
+            await ev.submit_evaluation("t3", "u2", 5, None)
+            return await ev.daily_summary("u1")
+
+        ev.init_eval_db()
+        summary = asyncio.run(run())
+        self.assertEqual(summary["satisfaction_avg"], 3.0)
+        self.assertEqual(summary["ratings_count"], 2)
+
+    def test_bulk_insert(self):
+        from app import a2a
+        from app import eval as ev
+
+        async def run():
+            ids = await ev.submit_evaluations_bulk([("t1", "u3", 5, None), ("t2", "u3", 3, "meh")])
+            return ids, await ev.daily_summary("u3")
+
+        ids, summary = asyncio.run(run())
+        self.assertEqual(len(ids), 2)
+        self.assertLess(ids[0], ids[1])
+        self.assertEqual(summary["satisfaction_avg"], 4.0)
+
+        mids = a2a.send_messages_bulk([
+            {"from_agent": "a", "to_agent": "b", "payload": {}, "conversation_id": "c"},
+            {"from_agent": "b", "to_agent": "a", "payload": {"x": 1}, "conversation_id": "c", "intent": "ack"},
+        ])
+        self.assertEqual(len(set(mids)), 2)
+
+    def test_send_message_without_explicit_init(self):
+        from app import a2a
+        from app.sqlite_pool import get_connection
+
+        mid = a2a.send_message("PastPatternAgent", "IntegrationActionAgent", {"k": 1}, "conv-1")
+        row = get_connection(os.environ["A2A_DB"]).execute(
+            "SELECT conversation_id, payload FROM a2a_messages WHERE message_id=?", (mid,)
+        ).fetchone()
+        self.assertEqual(row, ("conv-1", '{"k":1}'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -16,7 +16,8 @@ class TestLLMWrap(unittest.TestCase):
                     old_keys[k] = os.environ[k]
                     del os.environ[k]
             llm._client = None  # force reinit
-            with self.assertRaises(RuntimeError):
+            # Provider is resolved once at import time
+            with mock.patch.object(llm, "_PROVIDER", None), self.assertRaises(RuntimeError):
                 llm.call_llm("hello", max_tokens=1)
         finally:
             for k, v in old_keys.items():
@@ -0,0 +1,21 @@
+import unittest
+from unittest import mock
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_sliding_window(self):
+        import app.mcp as mcp
+
+        now = [10**12]
+        limiter = mcp.RateLimiter(max_per_minute=3)
+        with mock.patch.object(mcp.time, "monotonic_ns", lambda: now[0]):
+            self.assertEqual([limiter.allow("a") for _ in range(4)], [True, True, True, False])
+            self.assertTrue(limiter.allow("b"))
+            now[0] += 59 * 10**9
+            self.assertFalse(limiter.allow("a"))
+            now[0] += 2 * 10**9
+            self.assertEqual([limiter.allow("a") for _ in range(4)], [True, True, True, False])
+
+
+if __name__ == "__main__":
+    unittest.main()
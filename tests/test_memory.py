@@ -1,8 +1,16 @@
 import os
+import tempfile
 import unittest
+from unittest import mock
 
 
 class TestMemory(unittest.TestCase):
+    def tearDown(self):
+        from app.sqlite_pool import close_all
+
+        # Tests delete their DB files; drop the shared handles with them.
+        close_all()
+
     def test_compress_summary_stub(self):
         import app.memory as mem
 
@@ -25,6 +33,9 @@ class TestMemory(unittest.TestCase):
             mem.initialize_memory(path)
             self.assertTrue(os.path.exists(path))
         finally:
+            from app.sqlite_pool import close_all
+
+            close_all()
             if os.path.exists(path):
                 os.remove(path)
 
@@ -47,6 +58,122 @@ class TestMemory(unittest.TestCase):
         finally:
             llm.create_embedding = orig_embed
 
+    @unittest.skipUnless(__import__('importlib').util.find_spec('faiss') is not None, "faiss not installed")
+    def test_index_cached_and_flushed(self):
+        import faiss
+        import app.memory as mem
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "mem.db")
+            mem.initialize_memory(path)
+            with mock.patch.object(faiss, "read_index", wraps=faiss.read_index) as read_index:
+                mem.add_memory("u2", "a", "first", [1.0, 0.0, 0.0], db_path=path)
+                mem.add_memory("u2", "b", "second", [0.0, 1.0, 0.0], db_path=path)
+                self.assertEqual(mem.search_memory("u2", [0.0, 1.0, 0.0], top_k=1, db_path=path), ["second"])
+                read_index.assert_not_called()
+            mem.flush_indexes()
+            self.assertTrue(os.path.exists(mem._index_path("u2", path)))
+            mem.delete_user_data("u2", db_path=path)
+
+    @unittest.skipUnless(__import__('importlib').util.find_spec('faiss') is not None, "faiss not installed")
+    def test_legacy_l2_index_is_rebuilt_as_cosine(self):
+        import faiss
+        import app.memory as mem
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "mem.db")
+            mem.initialize_memory(path)
+            mem.add_memory("u3", "a", "far", [10.0, 0.0], db_path=path)
+            mem.add_memory("u3", "b", "near", [0.1, 0.1], db_path=path)
+            mem.flush_indexes()
+            # Simulate an index written before the switch to inner product.
+            faiss.write_index(faiss.IndexIDMap(faiss.IndexFlatL2(2)), mem._index_path("u3", path))
+            mem._INDEX_CACHE.clear()
+
+            # Cosine ranks the direction-matching vector first despite its length.
+            self.assertEqual(mem.search_memory("u3", [5.0, 5.0], top_k=1, db_path=path), ["near"])
+            self.assertEqual(mem._INDEX_CACHE[("u3", path)].metric_type, faiss.METRIC_INNER_PRODUCT)
+            mem.delete_user_data("u3", db_path=path)
+
+    @unittest.skipUnless(__import__('importlib').util.find_spec('faiss') is not None, "faiss not installed")
+    def test_add_memories_bulk(self):
+        import app.memory as mem
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "mem.db")
+            mem.initialize_memory(path)
+            ids = mem.add_memories_bulk(
+                "u5",
+                [("a", "x-axis", [1.0, 0.0]), ("b", "y-axis", [0.0, 1.0])],
+                db_path=path,
+            )
+            self.assertEqual(len(ids), 2)
+            self.assertLess(ids[0], ids[1])
+            self.assertEqual(mem.search_memory("u5", [0.1, 0.9], top_k=1, db_path=path), ["y-axis"])
+            self.assertEqual(
+                mem.search_memory_batch("u5", [[0.9, 0.1], [0.1, 0.9]], top_k=1, db_path=path),
+                [["x-axis"], ["y-axis"]],
+            )
+            mem.delete_user_data("u5", db_path=path)
+
+    @unittest.skipUnless(__import__('importlib').util.find_spec('faiss') is not None, "faiss not installed")
+    def test_switches_to_quantized_index_past_threshold(self):
+        import random
+        import faiss
+        import app.memory as mem
+
+        rng = random.Random(0)
+        items = [("t", f"m{i}", [rng.random() for _ in range(8)]) for i in range(40)]
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(mem, "FAISS_INDEX_TYPE", "IVF2,PQ2x4"), \
+                mock.patch.object(mem, "QUANTIZE_THRESHOLD", 30):
+            path = os.path.join(tmp, "mem.db")
+            mem.initialize_memory(path)
+            mem.add_memories_bulk("u6", items[:20], db_path=path)
+            self.assertIsInstance(mem._INDEX_CACHE[("u6", path)], faiss.IndexIDMap2)
+            mem.add_memories_bulk("u6", items[20:], db_path=path)
+            index = mem._INDEX_CACHE[("u6", path)]
+            self.assertNotIsInstance(index, faiss.IndexIDMap2)
+            self.assertEqual(index.ntotal, 40)
+            self.assertEqual(len(mem.search_memory("u6", items[0][2], top_k=3, db_path=path)), 3)
+            mem.delete_user_data("u6", db_path=path)
+
+    @unittest.skipUnless(__import__('importlib').util.find_spec('faiss') is not None, "faiss not installed")
+    def test_failed_index_add_rolls_back_insert(self):
+        import app.memory as mem
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "mem.db")
+            mem.initialize_memory(path)
+            broken = mock.Mock(add_with_ids=mock.Mock(side_effect=RuntimeError("boom")))
+            with mock.patch.dict(mem._INDEX_CACHE, {("u7", path): broken}):
+                with self.assertRaises(RuntimeError):
+                    mem.add_memory("u7", "t", "s", [1.0, 0.0], db_path=path)
+            count = mem._conn(path).execute(mem._SQL_COUNT_USER, ("u7",)).fetchone()[0]
+            self.assertEqual(count, 0)
+
+    def test_migrate_json_embeddings_to_blob(self):
+        import sqlite3
+        import app.memory as mem
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "mem.db")
+            mem.initialize_memory(path)
+            conn = sqlite3.connect(path)
+            conn.execute(
+                "INSERT INTO memories (user_id, text, summary, embedding, ts) VALUES (?,?,?,?,?)",
+                ("u4", "t", "s", "[0.5, 0.25]", 0),
+            )
+            conn.commit()
+            conn.close()
+
+            self.assertEqual(mem.migrate_embeddings_to_blob(path), 1)
+            conn = sqlite3.connect(path)
+            kind, blob = conn.execute("SELECT typeof(embedding), embedding FROM memories").fetchone()
+            conn.close()
+            self.assertEqual(kind, "blob")
+            self.assertEqual(mem._decode_embedding(blob).tolist(), [0.5, 0.25])
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -1,67 +1,81 @@
 import asyncio
 import json
+import os
+import re
+import tempfile
 import unittest
+from unittest import mock
 
 
-def _stub_call_llm(prompt: str, system=None, temperature=0.7, max_tokens=500) -> str:
-    if "\"agent\": \"PastEmotionAgent\"" in prompt:
-        return json.dumps({
-            "agent": "PastEmotionAgent",
-            "focus_period": "past",
-            "analysis_summary": "past summary",
-            "key_events": [],
-            "dominant_emotions": [],
-            "triggers": [],
-            "coping_strategies": [],
-            "questions_for_user": [],
-            "confidence": 0.9,
-        })
-    if "\"agent\": \"PresentEmotionAgent\"" in prompt:
-        return json.dumps({
-            "agent": "PresentEmotionAgent",
-            "focus_period": "present",
-            "state_summary": "present",
-            "emotions": [],
-            "sensations": [],
-            "context": [],
-            "needs": [],
-            "recommended_actions": [],
-            "confidence": 0.8,
-        })
-    if "\"agent\": \"FutureEmotionAgent\"" in prompt:
-        return json.dumps({
-            "agent": "FutureEmotionAgent",
-            "focus_period": "future",
-            "projection_summary": "future",
-            "scenarios": [],
-            "risks": [],
-            "opportunities": [],
-            "plan_steps": [],
-            "motivation_prompts": [],
-            "confidence": 0.7,
-        })
-    if "\"agent\": \"IntegrationAgent\"" in prompt:
-        return json.dumps({
-            "agent": "IntegrationAgent",
-            "focus_period": "integration",
-            "integrated_summary": "ok",
-            "contradictions": [],
-            "themes": [],
-            "plan": [],
-            "metrics": [],
-            "next_check_in": "2025-01-01T00:00:00Z",
-            "confidence": 0.6,
-        })
-    return "{}"
+_AGENT_RE = re.compile(r'"agent": "(PastEmotionAgent|PresentEmotionAgent|FutureEmotionAgent|IntegrationAgent)"')
+
+# Canned replies, serialized once; keyed by the agent name captured above.
+_RESPONSES = {
+    "PastEmotionAgent": json.dumps({
+        "agent": "PastEmotionAgent",
+        "focus_period": "past",
+        "analysis_summary": "past summary",
+        "key_events": [],
+        "dominant_emotions": [],
+        "triggers": [],
+        "coping_strategies": [],
+        "questions_for_user": [],
+        "confidence": 0.9,
+    }),
+    "PresentEmotionAgent": json.dumps({
+        "agent": "PresentEmotionAgent",
+        "focus_period": "present",
+        "state_summary": "present",
+        "emotions": [],
+        "sensations": [],
+        "context": [],
+        "needs": [],
+        "recommended_actions": [],
+        "confidence": 0.8,
+    }),
+    "FutureEmotionAgent": json.dumps({
+        "agent": "FutureEmotionAgent",
+        "focus_period": "future",
+        "projection_summary": "future",
+        "scenarios": [],
+        "risks": [],
+        "opportunities": [],
+        "plan_steps": [],
+        "motivation_prompts": [],
+        "confidence": 0.7,
+    }),
+    "IntegrationAgent": json.dumps({
+        "agent": "IntegrationAgent",
+        "focus_period": "integration",
+        "integrated_summary": "ok",
+        "contradictions": [],
+        "themes": [],
+        "plan": [],
+        "metrics": [],
+        "next_check_in": "2025-01-01T00:00:00Z",
+        "confidence": 0.6,
+    }),
+}
+
+
+async def _stub_call_llm(prompt: str, system=None, temperature=0.7, max_tokens=500, model_override=None) -> str:
+    m = _AGENT_RE.search(prompt)
+    return _RESPONSES[m.group(1)] if m else "{}"
 
 
 class TestOrchestrator(unittest.TestCase):
     def test_orchestrate_with_stub(self):
         import app.orchestrator as orch
+        from app import llm
 
-        orig = orch.call_llm
+        orig = orch.acall_llm
+        orig_llm = llm.acall_llm
+        tmp = tempfile.TemporaryDirectory()
+        env = mock.patch.dict(os.environ, {"EMBEDDING_CACHE_DB": os.path.join(tmp.name, "emb.db")})
+        env.start()
         try:
-            orch.call_llm = _stub_call_llm
+            # Agent batches go through llm.acall_llm_batch -> llm.acall_llm.
+            orch.acall_llm = llm.acall_llm = _stub_call_llm
             result = asyncio.run(orch.orchestrate("user123", "focus", "history", "vision"))
             self.assertIn("past", result)
             self.assertIn("present", result)
@@ -69,7 +83,20 @@ class TestOrchestrator(unittest.TestCase):
             self.assertIn("integration", result)
             self.assertIn("trace_id", result)
         finally:
-            orch.call_llm = orig
+            from app.sqlite_pool import close_all_async
+
+            orch.acall_llm = orig
+            llm.acall_llm = orig_llm
+            asyncio.run(close_all_async())
+            env.stop()
+            tmp.cleanup()
+
+    def test_parse_json_ignores_surrounding_text(self):
+        from app.orchestrator import _parse_json
+
+        text = '<think>hmm</think>Sure:\n```json\n{"a": {"b": 1}}\n```\nAnything {else}?'
+        self.assertEqual(_parse_json(text), {"a": {"b": 1}})
+        self.assertEqual(_parse_json("no json")["error"], "failed_to_parse_json")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,19 @@
+import unittest
+from unittest import mock
+
+
+class TestSentimentTool(unittest.TestCase):
+    def test_repeated_text_is_served_from_cache(self):
+        import app.tools as tools
+
+        tools._SENTIMENT_CACHE.clear()
+        with mock.patch.object(tools, "call_llm", return_value='Sure: {"emotion": "calm", "score": 0.9}') as llm:
+            first = tools.sentiment_tool("I felt anxious about exams")
+            second = tools.sentiment_tool("I felt anxious about exams")
+        self.assertEqual(first, {"emotion": "calm", "score": 0.9})
+        self.assertEqual(second, first)
+        self.assertEqual(llm.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+
+import numpy as np
+
+from app.vectors import dequantize_int8, int8_scores, quantize_int8
+
+
+class TestVectors(unittest.TestCase):
+    def test_int8_roundtrip_and_ranking(self):
+        rng = np.random.default_rng(0)
+        keys = rng.standard_normal((50, 64)).astype(np.float32)
+        query = keys[7] + 0.01 * rng.standard_normal(64).astype(np.float32)
+
+        q, s = quantize_int8(query)
+        self.assertEqual(q.dtype, np.int8)
+        np.testing.assert_allclose(dequantize_int8(q, s), query, atol=s)
+
+        packed = [quantize_int8(k) for k in keys]
+        keys_q = np.stack([p[0] for p in packed])
+        keys_s = np.array([p[1] for p in packed], dtype=np.float32)
+        scores = int8_scores(q, s, keys_q, keys_s)
+        np.testing.assert_allclose(scores, keys @ query, rtol=0.05, atol=0.5)
+        self.assertEqual(int(np.argmax(scores)), int(np.argmax(keys @ query)))
+
+    def test_zero_vector(self):
+        q, s = quantize_int8([0.0, 0.0])
+        self.assertEqual(q.tolist(), [0, 0])
+        self.assertEqual(s, 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()